@@ -163,10 +163,22 @@ async def revision_websocket(websocket: WebSocket, session_id: str):
         - Handles disconnection and errors gracefully
         
     Message Types Sent:
+        - "bubble": A single message sent ahead of the final response: a pending
+          transition, or an explanation bubble as soon as it is generated
         - "message": Regular AI response with conversation data
         - "session_complete": Final summary when revision is finished
     """
     await websocket.accept()
+    loop = asyncio.get_running_loop()
+
+    streamed = []
+
+    def send_bubble(bubble):
+        # Called from the worker thread; hand the send back to the event loop
+        streamed.append(bubble)
+        asyncio.run_coroutine_threadsafe(
+            websocket.send_text(json.dumps({"type": "bubble", "content": bubble})), loop
+        )
     
     try:
         while True:
@@ -174,22 +186,29 @@ async def revision_websocket(websocket: WebSocket, session_id: str):
             user_message = await websocket.receive_text()
             logger.info(f"Received message: '{user_message}' for session: {session_id}")  
             
+            streamed.clear()
             try:
                 # Run synchronous orchestrator in thread pool
                 logger.info(f"Processing with revision_agent...")  
                 result = await run_in_thread(
                     revision_agent.handle_user_input,
                     session_id,
-                    user_message
+                    user_message,
+                    on_bubble=send_bubble
                 )
                 
                 logger.info(f"Got result: {type(result)} - {result.get('response', 'No response')[:50]}...")
                 logger.info(f"WebSocket result message_format: {result.get('message_format')}")  
                 
+                content = result["response"]
+                if streamed and isinstance(content, list):
+                    # Bubbles already sent as "bubble" frames must not be shown twice
+                    content = [msg for msg in content if msg not in streamed]
+
                 # Prepare response data
                 response_data = {
                     "type": "message",
-                    "content": result["response"],
+                    "content": content,
                     "message_format": result.get("message_format", "single"),
                     "conversation_count": result.get("conversation_count", 0),    
                     "is_session_complete": result.get("is_session_complete", False), 
@@ -17,6 +17,21 @@ class Config:
     COLLECTION_NAME: str = "topics_generated"
     REVISION_COLLECTION: str = "revision_sessions" 
     
+    # LLM Response Cache
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "3600"))
+    LLM_CACHE_MAXSIZE: int = int(os.getenv("LLM_CACHE_MAXSIZE", "1024"))
+    # Semantic cache is off unless an embedding model is configured (needs sentence-transformers)
+    SEMANTIC_CACHE_MODEL: str = os.getenv("SEMANTIC_CACHE_MODEL", "")
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+    # Local INT8 ONNX classifiers (need onnxruntime + tokenizers); the LLM is used when unset
+    INTENT_MODEL_PATH: str = os.getenv("INTENT_MODEL_PATH", "")
+    RELEVANCE_MODEL_PATH: str = os.getenv("RELEVANCE_MODEL_PATH", "")
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", "0.8"))
+    # Embedding-similarity relevance check (needs sentence-transformers), e.g. all-MiniLM-L6-v2
+    RELEVANCE_EMBEDDING_MODEL: str = os.getenv("RELEVANCE_EMBEDDING_MODEL", "")
+    
     # Dynamic Defaults (calculated per topic)
     MIN_CONVERSATIONS: int = 8
     MAX_CONVERSATIONS: int = 50
@@ -1,9 +1,8 @@
 from typing import Dict, Any
-from .llm import GeminiLLMWrapper
+from .llm import get_llm
 from backend.prompts import conclusion_prompts
 from langchain_core.tools import tool
 
-llm_wrapper = GeminiLLMWrapper()
 
 @tool
 def summary(correct: int, total: int, conversation_history: str = "") -> str:
@@ -15,13 +14,13 @@ def summary(correct: int, total: int, conversation_history: str = "") -> str:
     if not conversation_history:
         conversation_history = "No conversation history available."
     
-    prompt = conclusion_prompts.CONCLUSION_TEMPLATE.format(
+    prompt = conclusion_prompts.CONCLUSION_FORMATTER(
         correct=correct, 
         total=total, 
         conversation_history=conversation_history
     )
     try:
-        resp = llm_wrapper.generate_response([{"role": "user", "content": prompt}])
+        resp = get_llm().generate_from_prompt(prompt)
         if not isinstance(resp, str) or not resp.strip():
             raise ValueError("Invalid response from LLM")
         return resp.strip()
@@ -30,7 +29,7 @@ def summary(correct: int, total: int, conversation_history: str = "") -> str:
 
 class ConclusionAgent:
     def __init__(self, llm=None):
-        self.llm = llm or llm_wrapper
+        self.llm = llm or get_llm()
         self.summary = summary
     
     def get_all_tools(self):
@@ -9,6 +9,6 @@ class FeedbackAgent:
             return feedback_prompts.FEEDBACK_CORRECT
         if verdict == "PARTIAL":
             correction = details.get("correction", "Add missing parts.")
-            return feedback_prompts.FEEDBACK_PARTIAL.format(correction=correction)
+            return feedback_prompts.FEEDBACK_PARTIAL_FORMATTER(correction=correction)
         correction = details.get("correction", "Let's review this concept again.")
-        return feedback_prompts.FEEDBACK_WRONG.format(correction=correction)
+        return feedback_prompts.FEEDBACK_WRONG_FORMATTER(correction=correction)
@@ -1,12 +1,17 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import BaseMessage
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional
+import asyncio
 import logging
+from functools import lru_cache
 from backend.config import Config 
 
 logger = logging.getLogger(__name__)
 
 class GeminiLLMWrapper:
+    # Returned when generation fails; callers must not cache it
+    FALLBACK_RESPONSE = "I apologize, but I'm having trouble generating a response right now."
+
     def __init__(self):
         self.llm = ChatGoogleGenerativeAI(
             google_api_key=Config.GEMINI_API_KEY,
@@ -16,6 +21,33 @@ class GeminiLLMWrapper:
         )
         logger.info(f"Initialized LLM: {Config.GEMINI_MODEL} with max_tokens=4096")
     
+    # Templates put their static instructions before this marker and per-call fields after it
+    INPUT_MARKER = "\n---\nINPUT:"
+
+    @classmethod
+    def prompt_messages(cls, prompt: str) -> List[Dict[str, Any]]:
+        """Wrap a prompt as a conversation.
+
+        The static instruction block of a marked template is sent as the system
+        instruction so it forms an identical, cacheable prefix across calls; only
+        the dynamic tail goes in the user message.
+        """
+        static, sep, dynamic = prompt.partition(cls.INPUT_MARKER)
+        if not sep:
+            return [{"role": "user", "content": prompt}]
+        return [
+            {"role": "system", "content": static.strip()},
+            {"role": "user", "content": "INPUT:" + dynamic},
+        ]
+
+    def generate_from_prompt(self, prompt: str, **kwargs) -> str:
+        """Generate a response for a single user prompt"""
+        return self.generate_response(self.prompt_messages(prompt), **kwargs)
+
+    async def agenerate_from_prompt(self, prompt: str, **kwargs) -> str:
+        """Async counterpart of generate_from_prompt"""
+        return await self.agenerate_response(self.prompt_messages(prompt), **kwargs)
+
     def generate_response(self, messages: List[BaseMessage], **kwargs) -> str:
         """Generate response synchronously"""
         try:
@@ -33,8 +65,53 @@ class GeminiLLMWrapper:
             
         except Exception as e:
             logger.error(f"LLM generation error: {e}", exc_info=True)
-            return "I apologize, but I'm having trouble generating a response right now."
-    
+            return self.FALLBACK_RESPONSE
+
+    async def agenerate_response(self, messages: List[BaseMessage], **kwargs) -> str:
+        """Generate response asynchronously"""
+        try:
+            logger.debug(f"Generating async response for {len(messages)} messages")
+            response = await self.llm.ainvoke(messages, **kwargs)
+
+            response_length = len(response.content)
+            logger.debug(f"Generated response: {response_length} characters")
+
+            if response_length > 3500:
+                logger.warning(f"Response length ({response_length}) is close to max_tokens limit. May be truncated.")
+
+            return response.content
+
+        except Exception as e:
+            logger.error(f"LLM async generation error: {e}", exc_info=True)
+            return self.FALLBACK_RESPONSE
+
+    def stream_response(self, messages: List[BaseMessage], **kwargs) -> Iterator[str]:
+        """Stream response text chunks as they are generated.
+
+        Errors are raised to the caller, which is expected to fall back to generate_response.
+        """
+        logger.debug(f"Streaming response for {len(messages)} messages")
+        for chunk in self.llm.stream(messages, **kwargs):
+            if chunk.content:
+                yield chunk.content
+
+    async def agenerate_responses_batch(self, messages_batch: List[List[BaseMessage]], **kwargs) -> List[str]:
+        """Generate responses for several independent prompts concurrently"""
+        logger.debug(f"Generating batch of {len(messages_batch)} responses")
+        return list(await asyncio.gather(
+            *(self.agenerate_response(messages, **kwargs) for messages in messages_batch)
+        ))
+
+    def generate_responses_batch(self, messages_batch: List[List[BaseMessage]], **kwargs) -> List[str]:
+        """Blocking counterpart of agenerate_responses_batch; not for use inside a running event loop"""
+        return asyncio.run(self.agenerate_responses_batch(messages_batch, **kwargs))
+
     def generate_response_sync(self, messages: List[BaseMessage], **kwargs) -> str:
         """Alias for generate_response for backward compatibility"""
-        return self.generate_response(messages, **kwargs)
\ No newline at end of file
+        return self.generate_response(messages, **kwargs)
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> GeminiLLMWrapper:
+    """Process-wide wrapper, created on first use rather than at import time"""
+    return GeminiLLMWrapper()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _canon(s: str) -> str:
+    """Canonicalize a cache-key field: collapse whitespace, trim and casefold"""
+    return _WHITESPACE_RE.sub(' ', s).strip().casefold()
+
+
+def make_cache_key(namespace: str, **fields: Any) -> str:
+    """Build a stable cache key from a namespace and canonicalized string fields.
+
+    "Photosynthesis", "photosynthesis " and " Photosynthesis" all map to the same key.
+    """
+    payload = {k: _canon(v) if isinstance(v, str) else v for k, v in fields.items()}
+    raw = json.dumps({"ns": namespace, "fields": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Response cache for deterministic LLM calls.
+
+    Backed by Redis when Config.REDIS_URL is set, otherwise by an in-process
+    LRU with a per-entry TTL.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: int = None, redis_url: str = None, namespace: str = "llm"):
+        self.namespace = namespace
+        self.maxsize = maxsize or Config.LLM_CACHE_MAXSIZE
+        self.ttl = ttl or Config.LLM_CACHE_TTL
+        self.stats = {"hits": 0, "misses": 0}
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+        redis_url = redis_url if redis_url is not None else Config.REDIS_URL
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+                logger.info("LLM cache backed by Redis")
+            except Exception as e:
+                logger.warning(f"Redis unavailable for LLM cache, using in-process cache: {e}")
+                self._redis = None
+
+    def key_for(self, tool_name: str, messages: List[Dict[str, Any]], model: str = None, **generation: Any) -> str:
+        """Cache key for a tool's message list and generation options (e.g. response_schema).
+
+        The messages are hashed as they are: only named fields passed to make_cache_key
+        are canonicalized, since casing or spacing may matter anywhere else in a prompt.
+        """
+        raw = json.dumps(
+            {"model": model or Config.GEMINI_MODEL, "tool": tool_name, "messages": messages, "generation": generation},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._lock:
+            self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if self._redis is not None:
+            try:
+                self._redis.setex(f"{self.namespace}:{key}", self.ttl, value)
+                return
+            except Exception as e:
+                logger.warning(f"Redis SETEX failed, falling back to in-process cache: {e}")
+
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+            self.stats = {"hits": 0, "misses": 0}
+
+    def _get(self, key: str) -> Optional[str]:
+        if self._redis is not None:
+            try:
+                return self._redis.get(f"{self.namespace}:{key}")
+            except Exception as e:
+                logger.warning(f"Redis GET failed, falling back to in-process cache: {e}")
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+
+class SemanticLLMCache:
+    """Nearest-neighbour response cache keyed on an embedding of a request's stable fields.
+
+    Catches near-duplicate requests (same concept and content, different history or
+    phrasing) that the exact cache misses. Disabled, and a no-op, unless
+    Config.SEMANTIC_CACHE_MODEL is set and sentence-transformers is installed.
+    """
+
+    def __init__(self, model_name: str = None, threshold: float = None, maxsize: int = None):
+        self.model_name = model_name if model_name is not None else Config.SEMANTIC_CACHE_MODEL
+        self.threshold = threshold or Config.SEMANTIC_CACHE_THRESHOLD
+        self.maxsize = maxsize or Config.LLM_CACHE_MAXSIZE
+        self.enabled = bool(self.model_name)
+        self.stats = {"hits": 0, "misses": 0}
+        self._model = None
+        self._entries: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+            except Exception as e:
+                logger.warning(f"Semantic LLM cache disabled: {e}")
+                self.enabled = False
+                return None
+        return self._model.encode(_canon(text), normalize_embeddings=True)
+
+    def get(self, namespace: str, text: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        vec = self._embed(text)
+        if vec is None:
+            return None
+
+        best_score, best_value = -1.0, None
+        with self._lock:
+            for other, value in self._entries.get(namespace, ()):
+                # Embeddings are unit-normalised, so the dot product is the cosine similarity
+                score = float(vec @ other)
+                if score > best_score:
+                    best_score, best_value = score, value
+            hit = best_score >= self.threshold
+            self.stats["hits" if hit else "misses"] += 1
+        return best_value if hit else None
+
+    def set(self, namespace: str, text: str, value: str) -> None:
+        if not self.enabled:
+            return
+        vec = self._embed(text)
+        if vec is None:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(namespace, [])
+            entries.append((vec, value))
+            if len(entries) > self.maxsize:
+                del entries[0]
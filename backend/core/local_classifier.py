@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LocalClassifier:
+    """Small text classifier exported to ONNX (e.g. an INT8-quantized DistilBERT).
+
+    Expects a ``tokenizer.json`` next to the model file. Disabled, and a no-op,
+    unless a model path is configured and onnxruntime and tokenizers are installed.
+    """
+
+    def __init__(self, model_path: str, labels: Sequence[str], min_confidence: float = None,
+                 max_length: int = 256):
+        self.model_path = model_path
+        self.labels = tuple(labels)
+        self.min_confidence = min_confidence or Config.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+        self.max_length = max_length
+        self.enabled = bool(model_path)
+        self.stats = {"hits": 0, "fallbacks": 0}
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> bool:
+        with self._lock:
+            if self._session is not None:
+                return True
+            try:
+                import onnxruntime
+                from tokenizers import Tokenizer
+
+                tokenizer = Tokenizer.from_file(os.path.join(os.path.dirname(self.model_path), "tokenizer.json"))
+                tokenizer.enable_truncation(self.max_length)
+                self._session = onnxruntime.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+                self._tokenizer = tokenizer
+                logger.info(f"Loaded local classifier: {self.model_path}")
+                return True
+            except Exception as e:
+                logger.warning(f"Local classifier disabled ({self.model_path}): {e}")
+                self.enabled = False
+                return False
+
+    def predict(self, text: str, pair: str = None) -> Optional[str]:
+        """Label for the input, or None when disabled or below the confidence threshold"""
+        if not self.enabled or not self._load():
+            return None
+
+        import numpy as np
+
+        encoding = self._tokenizer.encode(text, pair)
+        features = {
+            "input_ids": np.array([encoding.ids], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids], dtype=np.int64),
+        }
+        feeds = {i.name: features[i.name] for i in self._session.get_inputs() if i.name in features}
+        try:
+            logits = self._session.run(None, feeds)[0][0]
+        except Exception as e:
+            logger.warning(f"Local classifier inference failed: {e}")
+            return None
+
+        exp = np.exp(logits - logits.max())
+        probs = exp / exp.sum()
+        best = int(probs.argmax())
+        if probs[best] < self.min_confidence:
+            self.stats["fallbacks"] += 1
+            return None
+        self.stats["hits"] += 1
+        return self.labels[best]
+
+
+class EmbeddingRelevance:
+    """Relevance of a user input to a concept by embedding cosine similarity.
+
+    Concept embeddings are computed once per concept text. Disabled, and a no-op,
+    unless a model name is configured and sentence-transformers is installed.
+    """
+
+    def __init__(self, model_name: str = None, relevant_above: float = 0.35, irrelevant_below: float = 0.15):
+        self.model_name = model_name if model_name is not None else Config.RELEVANCE_EMBEDDING_MODEL
+        self.relevant_above = relevant_above
+        self.irrelevant_below = irrelevant_below
+        self.enabled = bool(self.model_name)
+        self._model = None
+        self._lock = threading.Lock()
+        self._concept_embedding = lru_cache(maxsize=256)(self._embed)
+
+    def _embed(self, text: str):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+        return self._model.encode(text, normalize_embeddings=True)
+
+    def classify(self, user_input: str, concept_text: str) -> Optional[str]:
+        """RELEVANT/IRRELEVANT, or None when disabled or the similarity is in between"""
+        if not self.enabled:
+            return None
+        try:
+            score = float(self._embed(user_input) @ self._concept_embedding(concept_text))
+        except Exception as e:
+            logger.warning(f"Embedding relevance disabled: {e}")
+            self.enabled = False
+            return None
+        if score >= self.relevant_above:
+            return "RELEVANT"
+        if score <= self.irrelevant_below:
+            return "IRRELEVANT"
+        return None
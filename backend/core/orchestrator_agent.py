@@ -1,18 +1,65 @@
-from typing import TypedDict, List, Dict, Any, Optional
-from .revision_agent import RevisionAgent
+from typing import TypedDict, List, Dict, Any, Callable, Optional, Tuple
+from langchain_core.runnables import RunnableConfig
+from .revision_agent import RevisionAgent, stream_structured_explanation
 from backend.core.quiz_agent import QuizAgent
 from backend.core.feedback_agent import FeedbackAgent
 from backend.core.qa_agent import QAAgent
 from backend.core.conclusion_agent import ConclusionAgent
 from .mongodb_client import MongoDBClient
 from backend.models.schemas import RevisionSessionData, SessionState
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 from langgraph.graph import StateGraph, END
 
+
+# Bounds on the rendered history (roughly 4 characters per token), so prompt size stays flat as a session grows
+HISTORY_MESSAGE_CHARS = 500
+HISTORY_CHAR_BUDGET = 4000
+# Latest turns kept verbatim; older ones collapse into one line of the student's messages
+HISTORY_VERBATIM_TURNS = 4
+HISTORY_SUMMARY_MESSAGE_CHARS = 80
+# Below this much remaining budget the summary line would be clipped to a meaningless stub
+HISTORY_SUMMARY_MIN_CHARS = 40
+
+# Warms the explanation cache for a session's later concepts while the student reads the first one
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+
+
+def _clip(text: Optional[str], limit: int = HISTORY_MESSAGE_CHARS) -> Optional[str]:
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "…"
+
+
+@lru_cache(maxsize=8)
+def _format_history(turns: Tuple[Tuple[Optional[str], Optional[str]], ...]) -> str:
+    """Render (user, assistant) turns, latest first, within HISTORY_CHAR_BUDGET.
+
+    The latest HISTORY_VERBATIM_TURNS turns are kept (long messages such as full
+    explanations are clipped); older turns are summarised as the student's own
+    messages, which the assistant replies were about. A turn's nodes share one
+    rendered string.
+    """
+    lines = []
+    used = 0
+    for i, (user, assistant) in enumerate(turns[:HISTORY_VERBATIM_TURNS]):
+        line = f"[{i}] user: {_clip(user)} | assistant: {_clip(assistant)}"
+        used += len(line) + 1
+        if lines and used > HISTORY_CHAR_BUDGET:
+            return "\n".join(lines)
+        lines.append(line)
+
+    remaining = HISTORY_CHAR_BUDGET - used
+    earlier = [_clip(user, HISTORY_SUMMARY_MESSAGE_CHARS) for user, _ in turns[HISTORY_VERBATIM_TURNS:] if user]
+    if earlier and remaining >= HISTORY_SUMMARY_MIN_CHARS:
+        lines.append(_clip("[earlier] student said: " + "; ".join(earlier), remaining))
+    return "\n".join(lines)
+
 class OrchestratorState(TypedDict):
     session_id: str
     student_id: str
@@ -41,6 +88,7 @@ class OrchestratorState(TypedDict):
     assistant_message: Optional[str]
     stage: Optional[str]
     intent: Optional[str]
+    relevance: Optional[str]
     response: Any
     message_format: Optional[str]
     is_session_complete: bool
@@ -148,18 +196,13 @@ class OrchestratorAgent:
             return "present_concept"
         return "end"
 
-    def _format_conversation_history(self, state: Dict[str, Any], limit: int = 10) -> str:
+    def _format_conversation_history(self, state: Dict[str, Any], limit: int = 20) -> str:
         if not state:
             return ""
         conv = state.get("conversation_history", [])[-limit:]
-        conv = list(reversed(conv))
-        lines = []
-        for i, turn in enumerate(conv):
-            user = turn.get("user_message", "")
-            assistant = turn.get("assistant_message", "")
-            ts = turn.get("timestamp", "")
-            lines.append(f"[{i}] user: {user} | assistant: {assistant}")
-        return "\n".join(lines)
+        return _format_history(tuple(
+            (turn.get("user_message", ""), turn.get("assistant_message", "")) for turn in reversed(conv)
+        ))
 
     def start_revision_session(self, topic: str, student_id: str, session_id: str) -> Dict[str, Any]:
         session_doc = self.mongo.get_revision_session(session_id) or {}
@@ -204,6 +247,7 @@ class OrchestratorAgent:
 
         session_doc["concept_chunks"] = subtopics
         session_doc["current_chunk_index"] = 0
+        self._prefetch_explanations(subtopics[1:])
 
         state = OrchestratorState(**session_doc)
         output_state = self.app.invoke(state)
@@ -220,7 +264,30 @@ class OrchestratorAgent:
         }
         return result
 
-    def handle_user_input(self, session_id: str, user_query: str) -> Dict[str, Any]:
+    def _prefetch_explanations(self, chunks: List[Dict[str, Any]]) -> None:
+        """Generate the explanations of the given concepts in the background with one batched call"""
+        items = [
+            (c.get("subtopic_title") or f"Concept {c.get('subtopic_number')}", c.get("content", ""), "")
+            for c in chunks
+        ]
+        if not items:
+            return
+
+        def _run():
+            try:
+                self.rev_agent.generate_structured_explanations_batch.invoke({"items": items})
+            except Exception as e:
+                logger.warning(f"Explanation prefetch failed: {e}")
+
+        _prefetch_pool.submit(_run)
+
+    def handle_user_input(self, session_id: str, user_query: str,
+                          on_bubble: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run one turn of the session graph.
+
+        on_bubble, if given, is called with each explanation bubble as soon as it
+        is generated, before the turn's full response is returned.
+        """
         session_doc = self.mongo.get_revision_session(session_id) or {}
         if not session_doc:
             return {"response": "Session not found. Start a new revision session.", "is_session_complete": True, "conversation_count": 0}
@@ -228,7 +295,7 @@ class OrchestratorAgent:
         state = OrchestratorState(**session_doc)
         state["user_message"] = user_query
 
-        output_state = self.app.invoke(state)
+        output_state = self.app.invoke(state, config={"configurable": {"on_bubble": on_bubble}})
 
         self.mongo.save_revision_session(output_state)
 
@@ -241,7 +308,7 @@ class OrchestratorAgent:
         }
         return result
 
-    def present_concept_node(self, state: OrchestratorState) -> Dict[str, Any]:
+    def present_concept_node(self, state: OrchestratorState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
         if state.get("current_stage") == "explain" and state.get("response"):
             logger.info("Skipping redundant concept presentation")
             return state
@@ -278,12 +345,28 @@ class OrchestratorAgent:
         state["current_concept_questions_asked"] = []
         state["has_used_learning_support"] = False
         
+        existing_response = state.get("response", [])
+        transition_messages = []
+        if isinstance(existing_response, list):
+            transition_messages = [msg for msg in existing_response if msg.get("message_type") == "transition"]
+
         conv_hist = self._format_conversation_history(state)
-        structured_content = self.rev_agent.generate_structured_explanation.invoke({
-            "title": title, 
-            "content": content, 
-            "conversation_history": conv_hist
-        })
+        on_bubble = ((config or {}).get("configurable") or {}).get("on_bubble")
+        if on_bubble is not None:
+            # Transitions ("Moving to the next concept...") come before the new concept's bubbles
+            for message in transition_messages:
+                on_bubble(message)
+            # Push each bubble to the client as soon as it is complete in the LLM stream
+            structured_content = []
+            for bubble in stream_structured_explanation(title, content, conv_hist):
+                structured_content.append(bubble)
+                on_bubble(bubble)
+        else:
+            structured_content = self.rev_agent.generate_structured_explanation.invoke({
+                "title": title, 
+                "content": content, 
+                "conversation_history": conv_hist
+            })
         
         if not isinstance(structured_content, list) or not all(isinstance(msg, dict) for msg in structured_content):
             logger.warning(f"Invalid structured content for {title}: {structured_content}")
@@ -301,11 +384,8 @@ class OrchestratorAgent:
             ]
         })
         
-        existing_response = state.get("response", [])
-        if isinstance(existing_response, list):
-            transition_messages = [msg for msg in existing_response if msg.get("message_type") == "transition"]
-            if transition_messages:
-                messages = transition_messages + messages
+        if transition_messages:
+            messages = transition_messages + messages
         
         for i, message in enumerate(messages):
             turn = {
@@ -362,12 +442,20 @@ class OrchestratorAgent:
     def detect_intent_node(self, state: OrchestratorState) -> Dict[str, Any]:
         conv_hist = self._format_conversation_history(state)
         current_concept = state.get("current_question_concept", "")
-        question_intent = self.rev_agent.detect_question_intent.invoke({
+        current_chunk_idx = state.get("current_chunk_index", 0)
+        concept_chunks = state.get("concept_chunks", [])
+        current_content = ""
+        if current_chunk_idx < len(concept_chunks):
+            current_content = concept_chunks[current_chunk_idx].get("content", "")
+
+        # One fused call classifies intent and relevance; handle_qa reuses the relevance
+        triage = self.rev_agent.triage_user_input.invoke({
             "user_input": state["user_message"],
             "current_concept": current_concept,
+            "content": current_content,
             "conversation_history": conv_hist
         })
-        return {"intent": question_intent}
+        return {"intent": triage["intent"], "relevance": triage["relevance"]}
 
     def handle_ack_node(self, state: OrchestratorState) -> Dict[str, Any]:
         nudge = "Great! When you're ready, please choose one of the options above or ask me anything."
@@ -711,12 +799,14 @@ class OrchestratorAgent:
             combined = f"⚠️ **That question is off-topic.**\n\nWe're currently learning about **{current_concept}**. Questions about people, celebrities, or trivia are not part of this lesson.\n\nPlease ask questions related to **{current_concept}**, or use the buttons below to continue learning."
             logger.info(f"BLOCKED person/celebrity question for {current_concept}: {user_query[:100]}")
         else:
-            # Continue with relevance check
-            relevance = self.rev_agent.check_question_relevance.invoke({
-                "user_input": user_query,
-                "current_concept": current_concept,
-                "content": current_content
-            })
+            # Continue with relevance check (already classified by triage in detect_intent)
+            relevance = state.get("relevance")
+            if relevance is None:
+                relevance = self.rev_agent.check_question_relevance.invoke({
+                    "user_input": user_query,
+                    "current_concept": current_concept,
+                    "content": current_content
+                })
             
             if relevance == "RELEVANT":
                 answer = self.rev_agent.handle_qa_request.invoke({
@@ -1,110 +1,423 @@
-from typing import List, Dict, Any, Optional
-from .llm import GeminiLLMWrapper
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from .llm import GeminiLLMWrapper, get_llm
+from .llm_cache import LLMCache, SemanticLLMCache, make_cache_key
+from .local_classifier import EmbeddingRelevance, LocalClassifier
+from backend.config import Config
 from backend.prompts import revision_prompts
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from functools import lru_cache
+import json
 import logging
+import re
+
+try:
+    import orjson
+    # orjson accepts str or bytes and raises a ValueError subclass on bad input
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
-llm_wrapper = GeminiLLMWrapper()
+llm_cache = LLMCache()
+semantic_cache = SemanticLLMCache()
+# Keywords are deterministic per (title, content, question); keep them for a day
+keyword_cache = LLMCache(maxsize=4096, ttl=24 * 3600, namespace="keywords")
+# Optional distilled classifiers; low-confidence predictions fall through to the LLM
+intent_classifier = LocalClassifier(Config.INTENT_MODEL_PATH, ("ASKING_QUESTION", "PROVIDING_ANSWER", "ACKNOWLEDGEMENT"))
+relevance_classifier = LocalClassifier(Config.RELEVANCE_MODEL_PATH, ("RELEVANT", "IRRELEVANT"))
+embedding_relevance = EmbeddingRelevance()
+
+
+@dataclass(slots=True)
+class Bubble:
+    """One chat bubble of a structured concept explanation"""
+    assistant_message: str
+    section: str
+    message_type: str = "concept_section"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"assistant_message": self.assistant_message, "message_type": self.message_type, "section": self.section}
+
+
+def _semantic_text(*fields: str) -> Optional[str]:
+    """Stable request fields joined for the semantic cache; history is deliberately left out.
+
+    None while the semantic cache is disabled, so the concept content isn't copied for nothing.
+    """
+    return "\n".join(fields) if semantic_cache.enabled else None
+
+
+@lru_cache(maxsize=256)
+def _content_digest(content: str) -> bytes:
+    """Digest of a concept's content, hashed once per concept instead of once per key"""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
 
-# Standalone tool functions (outside the class)
-@tool
-def generate_structured_explanation(title: str, content: str, conversation_history: str = "") -> List[Dict[str, Any]]:
-    """Generate structured explanation with multiple detailed bubbles for a concept."""
-    
-    # Enhanced prompt - uses ||| separator instead of headers
-    enhanced_prompt = f"""{revision_prompts.STRUCTURED_EXPLANATION_TEMPLATE.format(
-        title=title, content=content, conversation_history=conversation_history
-    )}
 
-CRITICAL FORMATTING REQUIREMENTS:
-1. Separate the 3 messages with "|||" (three pipes)
-2. MESSAGE 1: ONLY concept name - MAXIMUM 20 CHARACTERS
-3. MESSAGE 2: Full detailed explanation (100+ words)
-4. MESSAGE 3: 2-3 concrete examples with details
-5. Do NOT include labels like "MESSAGE 1:", "BUBBLE_1:", etc. in the output
-6. Use proper markdown formatting with ** for bold text
-7. Include emojis as shown in the template
+def _cache_key(tool_name: str, messages: List[Dict[str, Any]], key_fields: Optional[Dict[str, Any]],
+               generation: Dict[str, Any]) -> str:
+    """Cache key for a call; the generation options are part of it, as they change the output format"""
+    if key_fields is None:
+        return llm_cache.key_for(tool_name, messages, **generation)
+    return make_cache_key(tool_name, model=Config.GEMINI_MODEL, generation=generation, **key_fields)
 
-Example output format:
-💡 **Gravity**
 
-|||
+def _cache_lookup(tool_name: str, key: str, semantic_key: Optional[str]) -> Optional[str]:
+    cached = llm_cache.get(key)
+    if cached is None and semantic_key is not None:
+        cached = semantic_cache.get(tool_name, semantic_key)
+        if cached is not None:
+            # Promote near-duplicate hits so the next identical request is served exactly
+            llm_cache.set(key, cached)
+    if cached is not None:
+        logger.debug("LLM cache hit for %s (stats: %s)", tool_name, llm_cache.stats)
+    return cached
 
-📖 **What is Gravity?**
 
-Gravity is the fundamental force...
-[Full explanation continues]
+def _cache_store(tool_name: str, key: str, semantic_key: Optional[str], resp: str) -> None:
+    if resp == GeminiLLMWrapper.FALLBACK_RESPONSE:
+        return
+    llm_cache.set(key, resp)
+    if semantic_key is not None:
+        semantic_cache.set(tool_name, semantic_key, resp)
 
-|||
 
-🌟 **Examples of Gravity**
+def _cached_generate(tool_name: str, prompt: str, key_fields: Optional[Dict[str, Any]] = None,
+                     semantic_key: Optional[str] = None, **kwargs) -> str:
+    """Generate a response, serving repeated prompts for the same tool from the LLM cache.
 
-🍎 **Example 1:** Falling objects...
-🌍 **Example 2:** Planetary orbits...
-"""
+    key_fields, when given, replaces the formatted prompt as the cache key so that
+    volatile prompt parts (e.g. conversation history) don't defeat the cache.
+    semantic_key is the text whose embedding is matched against the semantic cache
+    when the exact lookup misses.
+    """
+    messages = GeminiLLMWrapper.prompt_messages(prompt)
+    # Sampling with an explicit temperature is non-deterministic; don't cache it
+    if kwargs.get("temperature", 0) > 0:
+        return get_llm().generate_response(messages, **kwargs)
+
+    key = _cache_key(tool_name, messages, key_fields, kwargs)
+    cached = _cache_lookup(tool_name, key, semantic_key)
+    if cached is not None:
+        return cached
+
+    resp = get_llm().generate_response(messages, **kwargs)
+    _cache_store(tool_name, key, semantic_key, resp)
+    return resp
+
+
+async def _acached_generate(tool_name: str, prompt: str, key_fields: Optional[Dict[str, Any]] = None,
+                            semantic_key: Optional[str] = None, **kwargs) -> str:
+    """Async counterpart of _cached_generate"""
+    messages = GeminiLLMWrapper.prompt_messages(prompt)
+    if kwargs.get("temperature", 0) > 0:
+        return await get_llm().agenerate_response(messages, **kwargs)
+
+    key = _cache_key(tool_name, messages, key_fields, kwargs)
+    cached = _cache_lookup(tool_name, key, semantic_key)
+    if cached is not None:
+        return cached
+
+    resp = await get_llm().agenerate_response(messages, **kwargs)
+    _cache_store(tool_name, key, semantic_key, resp)
+    return resp
+
+
+# Response schemas for Gemini's JSON mode; the model's output is constrained to them
+_BUBBLE_FIELDS = ("concept_name", "explanation", "examples")
+_BUBBLES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "concept_name": {"type": "string", "description": "💡 **Concept name**, 1-3 words, at most 20 characters"},
+        "explanation": {"type": "string", "description": "📖 **What is [concept]?** then a detailed 3-5 paragraph explanation"},
+        "examples": {"type": "string", "description": "🌟 **Examples of [concept]** then 2-3 concrete examples"},
+    },
+    "required": list(_BUBBLE_FIELDS),
+}
+# Generation options of the single-concept explanation tool; the batch path shares its cache entries
+_BUBBLES_JSON_MODE = {"response_mime_type": "application/json", "response_schema": _BUBBLES_SCHEMA}
+_EVAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "verdict": {"type": "string", "enum": ["CORRECT", "PARTIAL", "WRONG"]},
+        "justification": {"type": "string", "description": "One short sentence"},
+        "correction": {"type": "string", "description": "One short sentence with the correct idea/term"},
+    },
+    "required": ["verdict", "justification", "correction"],
+}
+# Single-label classifiers decode straight into one of their labels (Gemini's text/x.enum mode)
+_ENUM_MIME_TYPE = "text/x.enum"
+_RELEVANCE_SCHEMA = {"type": "string", "enum": ["RELEVANT", "IRRELEVANT"]}
+_INTENT_SCHEMA = {"type": "string", "enum": ["ASKING_QUESTION", "PROVIDING_ANSWER", "ACKNOWLEDGEMENT"]}
+# The grading fields are only present when an answer to a check question was graded
+_TRIAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": ["ASKING_QUESTION", "PROVIDING_ANSWER", "ACKNOWLEDGEMENT"]},
+        "relevance": {"type": "string", "enum": ["RELEVANT", "IRRELEVANT"]},
+        "verdict": {"type": "string", "enum": ["CORRECT", "PARTIAL", "WRONG"]},
+        "justification": {"type": "string", "description": "One short sentence"},
+        "correction": {"type": "string", "description": "One short sentence with the correct idea/term"},
+    },
+    "required": ["intent", "relevance"],
+}
+
+
+def _json_object(resp: str) -> Optional[Dict[str, Any]]:
+    """Decode a JSON-mode response; None for anything that is not a JSON object"""
+    if not resp.lstrip().startswith('{'):
+        return None
+    try:
+        data = _json_loads(resp)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+# Standalone tool functions (outside the class)
+@tool
+def generate_structured_explanation(title: str, content: str, conversation_history: str = "") -> List[Dict[str, Any]]:
+    """Generate structured explanation with multiple detailed bubbles for a concept."""
+    enhanced_prompt = _build_structured_explanation_prompt(title, content)
     
-    logger.info(f"Generating structured explanation for: {title}")
-    resp = llm_wrapper.generate_response([{"role":"user","content": enhanced_prompt}])
+    logger.info("Generating structured explanation for: %s", title)
+    resp = _cached_generate(
+        "generate_structured_explanation", enhanced_prompt, key_fields=_explanation_key_fields(title, content),
+        semantic_key=_semantic_text(title, content),
+        **_BUBBLES_JSON_MODE,
+    )
     
-    logger.info(f"LLM Response length: {len(resp)} characters")
-    logger.info(f"Response preview: {resp[:200]}...")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("LLM Response length: %d characters", len(resp))
+        logger.info("Response preview: %s...", resp[:200])
     
     bubbles = _parse_detailed_bubbles(resp, title, content)
     
-    logger.info(f"Generated {len(bubbles)} bubbles")
-    for i, bubble in enumerate(bubbles):
-        logger.info(f"Bubble {i+1} ({bubble['section']}): {len(bubble['assistant_message'])} chars")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Generated %d bubbles", len(bubbles))
+        for i, bubble in enumerate(bubbles):
+            logger.info("Bubble %d (%s): %d chars", i + 1, bubble.section, len(bubble.assistant_message))
     
-    return bubbles
+    return [bubble.to_dict() for bubble in bubbles]
 
-def _parse_detailed_bubbles(response: str, title: str, content: str) -> List[Dict[str, Any]]:
-    """Parse LLM response into 3 structured bubbles using ||| separator"""
-    bubbles = []
-    
-    # Split by the separator |||
-    messages = response.split('|||')
-    
-    # Clean up each message
-    messages = [msg.strip() for msg in messages if msg.strip()]
-    
-    logger.info(f"Parsed {len(messages)} messages from LLM response")
-    
-    # We expect exactly 3 messages
-    if len(messages) == 3:
+
+_BUBBLE_SECTIONS = ("Concept Name", "Explanation", "Examples")
+
+
+def stream_structured_explanation(title: str, content: str, conversation_history: str = "") -> Iterator[Dict[str, Any]]:
+    """Yield explanation bubbles one by one, each as soon as its ||| separator arrives in the LLM stream."""
+    prompt = _build_structured_explanation_stream_prompt(title, content)
+    messages = GeminiLLMWrapper.prompt_messages(prompt)
+    key_fields = _explanation_key_fields(title, content)
+    key = _stream_cache_key(title, content)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        yield from (bubble.to_dict() for bubble in _parse_detailed_bubbles(cached, title, content))
+        return
+
+    emitted = 0
+    chunks = []
+    buf = ""
+    try:
+        for chunk in get_llm().stream_response(messages):
+            chunks.append(chunk)
+            buf += chunk
+            # The first two bubbles are complete once their trailing separator shows up
+            while emitted < 2:
+                head, sep, rest = buf.partition('|||')
+                if not sep:
+                    break
+                buf = rest
+                head = head.strip()
+                if head:
+                    yield Bubble(head, _BUBBLE_SECTIONS[emitted]).to_dict()
+                    emitted += 1
+    except Exception as e:
+        logger.warning("Streaming failed for %s, falling back to buffered generation: %s", title, e)
+        resp = _cached_generate("stream_structured_explanation", prompt, key_fields=key_fields)
+        yield from (bubble.to_dict() for bubble in _parse_detailed_bubbles(resp, title, content)[emitted:])
+        return
+
+    full = "".join(chunks)
+    last = buf.strip()
+    if emitted == 2 and last and '|||' not in last:
+        llm_cache.set(key, full)
+        yield Bubble(last, _BUBBLE_SECTIONS[2]).to_dict()
+    else:
+        # Separators were missing or malformed; let the buffered parser decide
+        yield from (bubble.to_dict() for bubble in _parse_detailed_bubbles(full, title, content)[emitted:])
+
+
+# Items per single batched prompt, so the combined answer stays within max_output_tokens
+_BATCH_PROMPT_ITEMS = 4
+_BUBBLE_SEPARATOR = "\n\n|||\n\n"
+
+
+def _build_batch_prompt(indices: List[int], items: List[Tuple[str, str, str]]) -> str:
+    blocks = "\n".join(
+        f'<ITEM id="{i}">\nConcept: "{items[i][0]}"\nContent: {items[i][1]}\n</ITEM>'
+        for i in indices
+    )
+    return revision_prompts.STRUCTURED_EXPLANATION_BATCH_FORMATTER(items=blocks)
+
+
+def _parse_batch_response(resp: str) -> Dict[int, str]:
+    """Map item id -> |||-separated response text, for every well-formed entry of a batch answer"""
+    start, end = resp.find('['), resp.rfind(']')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = _json_loads(resp[start:end + 1])
+    except ValueError:
+        return {}
+
+    parsed = {}
+    for entry in data if isinstance(data, list) else ():
+        if not isinstance(entry, dict):
+            continue
+        parts = [str(entry.get(k) or "").strip() for k in ("concept_name", "explanation", "examples")]
+        try:
+            idx = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if all(parts):
+            parsed[idx] = _BUBBLE_SEPARATOR.join(parts)
+    return parsed
+
+
+async def agenerate_structured_explanations_batch(items: List[Tuple[str, str, str]]) -> List[List[Dict[str, Any]]]:
+    """Generate structured explanation bubbles for several (title, content, conversation_history) concepts at once."""
+    prompts = [_build_structured_explanation_prompt(title, content) for title, content, _ in items]
+    keys = [_cache_key("generate_structured_explanation", None, _explanation_key_fields(title, content), _BUBBLES_JSON_MODE)
+            for title, content, _ in items]
+    stream_keys = [_stream_cache_key(title, content) for title, content, _ in items]
+    responses = [llm_cache.get(key) for key in keys]
+
+    # Concepts missing from the cache share one prompt per group of _BATCH_PROMPT_ITEMS; groups run concurrently
+    missing = [i for i, resp in enumerate(responses) if resp is None]
+    if missing:
+        logger.info("Generating structured explanations for %d/%d concepts in one batch", len(missing), len(items))
+        groups = [missing[k:k + _BATCH_PROMPT_ITEMS] for k in range(0, len(missing), _BATCH_PROMPT_ITEMS)]
+        answers = await get_llm().agenerate_responses_batch(
+            [GeminiLLMWrapper.prompt_messages(_build_batch_prompt(group, items)) for group in groups]
+        )
+        for group, answer in zip(groups, answers):
+            parsed = _parse_batch_response(answer)
+            for i in group:
+                if i in parsed:
+                    responses[i] = parsed[i]
+                    llm_cache.set(keys[i], parsed[i])
+
+        # Items the batched answer dropped or mangled get their own prompt
+        retry = [i for i in missing if responses[i] is None]
+        if retry:
+            logger.warning("Batch answer incomplete, generating %d concepts individually", len(retry))
+            fresh = await get_llm().agenerate_responses_batch(
+                [GeminiLLMWrapper.prompt_messages(prompts[i]) for i in retry], **_BUBBLES_JSON_MODE
+            )
+            for i, resp in zip(retry, fresh):
+                responses[i] = resp
+                if resp != GeminiLLMWrapper.FALLBACK_RESPONSE:
+                    llm_cache.set(keys[i], resp)
+
+    # WebSocket turns stream their explanations, so warm that key too; its parser accepts either format
+    for key, resp in zip(stream_keys, responses):
+        if resp != GeminiLLMWrapper.FALLBACK_RESPONSE:
+            llm_cache.set(key, resp)
+
+    return [
+        [bubble.to_dict() for bubble in _parse_detailed_bubbles(resp, title, content)]
+        for resp, (title, content, _) in zip(responses, items)
+    ]
+
+
+def _generate_structured_explanations_batch(items: List[Tuple[str, str, str]]) -> List[List[Dict[str, Any]]]:
+    return asyncio.run(agenerate_structured_explanations_batch(items))
+
+
+# Sync invoke runs the batch on its own loop (worker threads only); ainvoke awaits it on the caller's loop
+generate_structured_explanations_batch = StructuredTool.from_function(
+    func=_generate_structured_explanations_batch, coroutine=agenerate_structured_explanations_batch,
+    name="generate_structured_explanations_batch",
+    description="Generate structured explanation bubbles for several (title, content, conversation_history) concepts at once.",
+)
+
+
+# Prompt builders are pure; the same concept is rendered again on retries, streaming fallbacks and revisits.
+# str hashes are cached on the object, so keying on the full content costs one hash per string.
+_PROMPT_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _build_structured_explanation_prompt(title: str, content: str) -> str:
+    """Build the structured explanation prompt for JSON mode"""
+    return revision_prompts.STRUCTURED_EXPLANATION_FORMATTER(title=title, content=content)
+
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _build_structured_explanation_stream_prompt(title: str, content: str) -> str:
+    """Build the streaming explanation prompt, whose bubbles are separated by |||"""
+    return revision_prompts.STRUCTURED_EXPLANATION_STREAM_FORMATTER(title=title, content=content)
+
+
+def _explanation_key_fields(title: str, content: str) -> Dict[str, Any]:
+    """An explanation depends only on its concept, so every session and code path shares one cache entry"""
+    return {"title": title, "content_digest": _content_digest(content).hex()}
+
+
+def _stream_cache_key(title: str, content: str) -> str:
+    """Keyed apart from the JSON-mode tool: the two cache entries hold different output formats"""
+    return _cache_key("stream_structured_explanation", None, _explanation_key_fields(title, content), {})
+
+
+def _parse_detailed_bubbles(response: str, title: str, content: str) -> List[Bubble]:
+    """Parse LLM response into 3 structured bubbles from a JSON-mode object or the ||| separator"""
+    data = _json_object(response)
+    if data is not None:
+        parts = [str(data.get(k) or "").strip() for k in _BUBBLE_FIELDS]
+        if all(parts):
+            return [Bubble(part, section) for part, section in zip(parts, _BUBBLE_SECTIONS)]
+
+    # Fast path: exactly two separators, three non-empty messages
+    a, _, rest = response.partition('|||')
+    b, _, c = rest.partition('|||')
+    a, b, c = a.strip(), b.strip(), c.strip()
+
+    if not (a and b and c) or '|||' in c:
+        # Stray/leading/trailing separators: fall back to a full split, dropping empty pieces
+        messages = [msg.strip() for msg in response.split('|||') if msg.strip()]
+        if len(messages) != 3:
+            # Fallback if AI didn't use the separator correctly
+            logger.warning("Expected 3 messages but got %d. Using fallback.", len(messages))
+            return _create_detailed_fallback(content, title)
+        a, b, c = messages
+
+    bubbles = [
         # Message 1: Concept Name
-        bubbles.append({
-            "assistant_message": messages[0],
-            "message_type": "concept_section",
-            "section": "Concept Name"
-        })
-        
+        Bubble(a, "Concept Name"),
         # Message 2: Explanation
-        bubbles.append({
-            "assistant_message": messages[1],
-            "message_type": "concept_section",
-            "section": "Explanation"
-        })
-        
+        Bubble(b, "Explanation"),
         # Message 3: Examples
-        bubbles.append({
-            "assistant_message": messages[2],
-            "message_type": "concept_section",
-            "section": "Examples"
-        })
-        
-        logger.info(f"Successfully created 3 bubbles from parsed messages")
+        Bubble(c, "Examples"),
+    ]
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Successfully created 3 bubbles from parsed messages")
         for i, bubble in enumerate(bubbles):
-            logger.info(f"Bubble {i+1}: {len(bubble['assistant_message'])} chars")
-    else:
-        # Fallback if AI didn't use the separator correctly
-        logger.warning(f"Expected 3 messages but got {len(messages)}. Using fallback.")
-        bubbles = _create_detailed_fallback(content, title)
+            logger.info("Bubble %d: %d chars", i + 1, len(bubble.assistant_message))
     
     return bubbles
 
 
-def _create_detailed_fallback(content: str, title: str) -> List[Dict[str, Any]]:
+_PARA_RE = re.compile(r'\n{2,}')
+# Sentence ends keep their punctuation; bare newlines also break
+_SENT_RE = re.compile(r'(?<=[.!?])\s+|\n')
+
+
+def _create_detailed_fallback(content: str, title: str) -> List[Bubble]:
     """Create detailed fallback structure using actual MongoDB content - PRESERVES ALL CONTENT"""
     bubbles = []
     
@@ -112,28 +425,23 @@ def _create_detailed_fallback(content: str, title: str) -> List[Dict[str, Any]]:
     
     # Handle edge case: no content
     if not content or len(content) < 50:
-        logger.warning(f"Content too short ({len(content)} chars), using placeholders")
+        logger.warning("Content too short (%d chars), using placeholders", len(content))
         return _create_placeholder_bubbles(title)
     
-    logger.info(f"Creating fallback from content ({len(content)} chars)")
+    logger.info("Creating fallback from content (%d chars)", len(content))
     
-    # STRATEGY: Split by paragraphs (double newline)
-    paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
-    
-    # If not enough paragraphs, split by single newline
-    if len(paragraphs) < 2:
-        paragraphs = [p.strip() for p in content.split('\n') if p.strip()]
+    # STRATEGY: Split by paragraphs (blank lines)
+    paragraphs = [p for chunk in _PARA_RE.split(content) if (p := chunk.strip())]
     
-    # If still not enough, use the whole content
+    # If not enough paragraphs, split by lines and sentences in a single pass
     if len(paragraphs) < 2:
-        import re
-        sentences = re.split(r'[.!?]\s+', content)
-        sentences = [s.strip() + '.' for s in sentences if s.strip()]
+        sentences = [s for chunk in _SENT_RE.split(content) if (s := chunk.strip())]
         
         if len(sentences) >= 2:
             # Use first few sentences for explanation, rest for examples
-            explanation_text = ' '.join(sentences[:max(1, len(sentences)//2)])
-            examples_text = ' '.join(sentences[max(1, len(sentences)//2):])
+            mid_point = max(1, len(sentences)//2)
+            explanation_text = ' '.join(sentences[:mid_point])
+            examples_text = ' '.join(sentences[mid_point:])
         else:
             explanation_text = content
             examples_text = content
@@ -144,129 +452,103 @@ def _create_detailed_fallback(content: str, title: str) -> List[Dict[str, Any]]:
         examples_text = '\n\n'.join(paragraphs[mid_point:])
     
     # BUBBLE 1: Concept Name ONLY (max 20 characters)
-    # Extract just the key term from title
-    concept_name = title.replace("**", "").strip()
-    # Truncate to 20 characters if needed
-    if len(concept_name) > 20:
-        words = concept_name.split()
-        concept_name = words[0] if words else concept_name[:20]
-        # Make sure it's still under 20 chars
-        if len(concept_name) > 20:
-            concept_name = concept_name[:20]
+    concept_name = _shorten_concept_name(title)
     
-    bubbles.append({
-        "assistant_message": f"💡 **{concept_name}**",
-        "message_type": "concept_section",
-        "section": "Concept Name"
-    })
+    bubbles.append(Bubble(f"💡 **{concept_name}**", "Concept Name"))
     
     # BUBBLE 2: Explanation
     explanation_content = f"📖 **What is {title}?**\n\n{explanation_text}"
     
-    bubbles.append({
-        "assistant_message": explanation_content,
-        "message_type": "concept_section",
-        "section": "Explanation"
-    })
+    bubbles.append(Bubble(explanation_content, "Explanation"))
     
     # BUBBLE 3: Examples
     examples_content = f"🌟 **Examples of {title}**\n\n{examples_text}"
     
-    bubbles.append({
-        "assistant_message": examples_content,
-        "message_type": "concept_section",
-        "section": "Examples"
-    })
+    bubbles.append(Bubble(examples_content, "Examples"))
     
     # Log final bubble sizes
-    for i, bubble in enumerate(bubbles):
-        logger.info(f"Fallback Bubble {i+1}: {len(bubble['assistant_message'])} chars")
+    if logger.isEnabledFor(logging.INFO):
+        for i, bubble in enumerate(bubbles):
+            logger.info("Fallback Bubble %d: %d chars", i + 1, len(bubble.assistant_message))
     
     return bubbles
 
 
-def _create_placeholder_bubbles(title: str) -> List[Dict[str, Any]]:
+def _clean_title(t: str) -> str:
+    """Strip bold markers and surrounding whitespace; skips the replace when there is no markdown"""
+    if '**' not in t:
+        return t.strip()
+    return t.replace('**', '').strip()
+
+
+def _shorten_concept_name(title: str, limit: int = 20) -> str:
+    """Concept name for bubble 1: title without bold markers, cut to its first word if over limit"""
+    name = _clean_title(title)
+    return name if len(name) <= limit else name.split(None, 1)[0][:limit]
+
+
+_PLACEHOLDER_EXPLANATION = (
+    "📖 **What is {title}?**\n\n**{title}** is an important concept in this topic that helps us understand "
+    "fundamental principles. It involves understanding the key mechanisms and processes that make this concept work in practice."
+)
+_PLACEHOLDER_EXAMPLES = (
+    "🌟 **Examples of {title}**\n\n🏠 **Example 1:** Everyday applications of {low}"
+    "\n\n🔬 **Example 2:** Scientific demonstrations of {low}"
+)
+
+
+def _create_placeholder_bubbles(title: str) -> List[Bubble]:
     """Create placeholder bubbles when content is insufficient"""
+    low = title.lower()
     # Extract concept name (max 20 characters)
-    concept_name = title.replace("**", "").strip()
-    if len(concept_name) > 20:
-        words = concept_name.split()
-        concept_name = words[0] if words else concept_name[:20]
-        # Ensure it's under 20 chars
-        if len(concept_name) > 20:
-            concept_name = concept_name[:20]
+    concept_name = _shorten_concept_name(title)
     
     return [
-        {
-            "assistant_message": f"💡 **{concept_name}**",
-            "message_type": "concept_section",
-            "section": "Concept Name"
-        },
-        {
-            "assistant_message": f"📖 **What is {title}?**\n\n**{title}** is an important concept in this topic that helps us understand fundamental principles. It involves understanding the key mechanisms and processes that make this concept work in practice.",
-            "message_type": "concept_section",
-            "section": "Explanation"
-        },
-        {
-            "assistant_message": f"🌟 **Examples of {title}**\n\n🏠 **Example 1:** Everyday applications of {title.lower()}\n\n🔬 **Example 2:** Scientific demonstrations of {title.lower()}",
-            "message_type": "concept_section",
-            "section": "Examples"
-        }
+        Bubble(f"💡 **{concept_name}**", "Concept Name"),
+        Bubble(_PLACEHOLDER_EXPLANATION.format(title=title), "Explanation"),
+        Bubble(_PLACEHOLDER_EXAMPLES.format(title=title, low=low), "Examples"),
     ]
 
 
+_PAD_TEMPLATE = "**Step {}:** Continue exploring this concept..."
+# Matched against the whole response; [ \t] keeps every alternative within a single line
+_STEP_MARKER_RE = re.compile(r'(?:🔸[ \t]*\*\*step|\*\*?step[ \t]|^[ \t]*step[ \t])', re.IGNORECASE | re.MULTILINE)
+
+
 @tool
 def generate_explanation_steps(title: str, content: str, conversation_history: str = "", steps: int = 4) -> List[str]:
     """Generate step-by-step explanation"""
-    prompt = revision_prompts.EXPLANATION_TEMPLATE.format(
+    prompt = revision_prompts.EXPLANATION_FORMATTER(
         title=title, steps=steps, content=content, conversation_history=conversation_history
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
-    
-    logger.info(f"Re-explain response length: {len(resp)} chars")
-    
-    # Parse steps from response
-    step_lines = []
-    current_step = []
+    resp = _cached_generate("generate_explanation_steps", prompt)
     
-    for line in resp.split('\n'):
-        line_stripped = line.strip()
-        
-        # Detect step markers
-        if any(marker in line_stripped.lower() for marker in ['🔸 **step', 'step ', '**step']):
-            if current_step:
-                step_lines.append('\n'.join(current_step).strip())
-            current_step = [line]
-        elif current_step:
-            current_step.append(line)
+    logger.info("Re-explain response length: %d chars", len(resp))
     
-    # Add last step
-    if current_step:
-        step_lines.append('\n'.join(current_step).strip())
+    # Parse steps from response: each step runs from the start of a marker line to the next one
+    starts = sorted({resp.rfind('\n', 0, m.start()) + 1 for m in _STEP_MARKER_RE.finditer(resp)})
+    step_lines = [resp[a:b].strip() for a, b in zip(starts, starts[1:] + [len(resp)])]
     
     # Fallback if parsing failed
     if not step_lines:
         step_lines = [l.strip() for l in resp.splitlines() if l.strip()]
     
     # Ensure we have exactly 'steps' items
-    while len(step_lines) < steps:
-        step_lines.append(f"**Step {len(step_lines)+1}:** Continue exploring this concept...")
+    step_lines.extend(_PAD_TEMPLATE.format(i + 1) for i in range(len(step_lines), steps))
     
     return step_lines[:steps]
 
 
-@tool  
-def generate_examples(title: str, content: str, conversation_history: str = "") -> str:
-    """Generate practical examples for the given concept."""
-    
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _examples_prompt(title: str, content: str, conversation_history: str) -> str:
     # Calculate content length and determine number of examples
     content_length = len(content)
     num_examples = 3 if content_length <= 100 else 2
     
     # Prepare example_3 placeholder (only if num_examples == 3)
-    example_3 = "🌟 **Example 3:** [Creative or unexpected example]\n→ This showcases **{title}** in [unique context or application]" if num_examples == 3 else ""
+    example_3 = f"🌟 **Example 3:** [Creative or unexpected example]\n→ This showcases **{title}** in [unique context or application]" if num_examples == 3 else ""
     
-    prompt = revision_prompts.EXAMPLES_TEMPLATE.format(
+    return revision_prompts.EXAMPLES_FORMATTER(
         title=title, 
         content=content, 
         conversation_history=conversation_history,
@@ -274,38 +556,204 @@ def generate_examples(title: str, content: str, conversation_history: str = "")
         content_length=content_length,
         example_3=example_3
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
+
+
+@tool  
+def generate_examples(title: str, content: str, conversation_history: str = "") -> str:
+    """Generate practical examples for the given concept."""
+    resp = _cached_generate("generate_examples", _examples_prompt(title, content, conversation_history))
     return resp.strip()
 
 
+_CHECK_QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["question", "keywords"],
+}
+_KEYWORDS_SCHEMA = {"type": "array", "minItems": 2, "maxItems": 5, "items": {"type": "string"}}
+
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _check_question_prompt(title: str, content: str, conversation_history: str) -> str:
+    return revision_prompts.CHECK_QUESTION_WITH_KEYWORDS_FORMATTER(
+        title=title, content=content, conversation_history=conversation_history
+    )
+
+
+def _question_from_response(title: str, content: str, resp: str) -> str:
+    """Return the check question, filing its keywords where extract_expected_keywords will find them"""
+    data = _json_object(resp)
+    question = str(data.get("question") or "").strip() if data else ""
+    if not question:
+        return resp.strip()
+
+    keywords = data.get("keywords")
+    if isinstance(keywords, list):
+        keywords = [k for k in (str(x).strip().lower() for x in keywords) if k]
+        if keywords:
+            keyword_cache.set(_keywords_key(title, content, question), json.dumps(keywords))
+    return question
+
+
 @tool
 def make_check_question(title: str, content: str, conversation_history: str = "") -> str:
     """Generate a check question to test understanding."""
-    prompt = revision_prompts.CHECK_QUESTION_TEMPLATE.format(
-        title=title, content=content, conversation_history=conversation_history
+    resp = _cached_generate(
+        "make_check_question", _check_question_prompt(title, content, conversation_history),
+        response_mime_type="application/json", response_schema=_CHECK_QUESTION_SCHEMA,
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
-    return resp.strip()
+    return _question_from_response(title, content, resp)
+
+
+_CODE_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$', re.IGNORECASE)
+_KEYWORD_SEP_RE = re.compile(r'\s*[,\n]\s*')
+_KEYWORD_JUNK = ' \t"\'[]`'
+
+
+def _parse_keywords(text: str) -> Optional[List[str]]:
+    """Parse a JSON keyword array, salvaging comma-separated or truncated arrays; None if nothing usable"""
+    stripped = _CODE_FENCE_RE.sub('', text.strip())
+    # Only JSON-looking output is worth parsing; avoids raising on plain prose
+    if not stripped.startswith('['):
+        return None
+
+    try:
+        data = _json_loads(stripped)
+    except ValueError:
+        data = None
+
+    if isinstance(data, list):
+        keywords = [k for k in (str(x).strip().lower() for x in data) if k]
+        # A single comma-joined element, e.g. ["gravity, mass, force"]
+        if len(keywords) == 1 and ',' in keywords[0]:
+            keywords = [k for k in _KEYWORD_SEP_RE.split(keywords[0]) if k]
+        return keywords or None
+
+    # Malformed or truncated array: split on separators and strip quotes/brackets
+    keywords = [k.strip(_KEYWORD_JUNK).lower() for k in _KEYWORD_SEP_RE.split(stripped)]
+    return [k for k in keywords if k] or None
+
+
+def _keywords_key(title: str, content: str, question: str) -> str:
+    h = hashlib.blake2b(_content_digest(content))
+    h.update("\x1f".join((title, question)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _title_keywords(title: str) -> List[str]:
+    """Fallback keywords when extraction fails; too coarse to grade an answer against"""
+    return [w.lower() for w in title.split()[:3]]
+
+
+def _keywords_from_response(key: str, title: str, resp: str) -> List[str]:
+    keywords = _parse_keywords(resp)
+    if keywords:
+        keyword_cache.set(key, json.dumps(keywords))
+        return keywords
+    
+    return _title_keywords(title)
 
 
 @tool
 def extract_expected_keywords(title: str, content: str, question: str) -> List[str]:
     """Extract expected keywords for answer evaluation."""
-    prompt = revision_prompts.KEYWORDS_EXTRACTION_TEMPLATE.format(
+    key = _keywords_key(title, content, question)
+    cached = keyword_cache.get(key)
+    if cached is not None:
+        return _json_loads(cached)
+
+    prompt = revision_prompts.KEYWORDS_EXTRACTION_FORMATTER(
         title=title, content=content, question=question
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
-    text = resp.strip()
-    
-    try:
-        import json
-        data = json.loads(text)
-        if isinstance(data, list):
-            return [str(x).strip().lower() for x in data if str(x).strip()]
-    except Exception:
-        pass
-    
-    return [w.lower() for w in title.split()[:3]]
+    # Keywords depend on the question; with the long content in front, an embedding truncated
+    # to the model's window would not see the question at all
+    resp = _cached_generate(
+        "extract_expected_keywords", prompt, semantic_key=_semantic_text(question),
+        response_mime_type="application/json", response_schema=_KEYWORDS_SCHEMA,
+    )
+    return _keywords_from_response(key, title, resp)
+
+
+_WORD_RE = re.compile(r'\w+')
+_SUFFIXES = ("ing", "es", "ed", "ly", "s")
+# Typos are tolerated only in long words sharing their first letters: a ratio alone would match
+# "saturated" to "unsaturated" or "heat" to "heart"
+_MATCH_RATIO = 0.8
+_FUZZY_MIN_LENGTH = 6
+_FUZZY_PREFIX = 3
+# Longer answers can embed the keywords in a wrong statement, so only short ones are graded locally
+_MAX_LOCAL_ANSWER_WORDS = 5
+# A keyword match says nothing about "not inertia", so negated answers go to the LLM
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|nor|neither|none|nothing|cannot|without)\b|n['’]t\b")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _word_match(k: str, a: str) -> bool:
+    if k == a:
+        return True
+    return (min(len(k), len(a)) >= _FUZZY_MIN_LENGTH and k[:_FUZZY_PREFIX] == a[:_FUZZY_PREFIX]
+            and SequenceMatcher(None, k, a).ratio() >= _MATCH_RATIO)
+
+
+def _keyword_match(keyword_stems: List[str], answer_stems: List[str]) -> bool:
+    """True if every word of the keyword is in the answer"""
+    return all(any(_word_match(k, a) for a in answer_stems) for k in keyword_stems)
+
+
+def _local_verdict(user_answer: str, expected_keywords: List[str]) -> Optional[Dict[str, Any]]:
+    """CORRECT when a short answer covers every keyword; None whenever the LLM has to decide.
+
+    Only a clear match is graded locally: a missing keyword may just be a paraphrase,
+    so WRONG and PARTIAL are always left to the LLM.
+    """
+    keywords = [k for k in expected_keywords if isinstance(k, str) and k.strip()]
+    answer = user_answer.lower()
+    answer_stems = [_stem(w) for w in _WORD_RE.findall(answer)]
+    if (not keywords or not answer_stems or len(answer_stems) > _MAX_LOCAL_ANSWER_WORDS
+            or _NEGATION_RE.search(answer)):
+        return None
+
+    for keyword in keywords:
+        if not _keyword_match([_stem(w) for w in _WORD_RE.findall(keyword.lower())], answer_stems):
+            return None
+    return {"verdict": "CORRECT", "justification": "Your answer covers the key ideas.",
+            "correction": "Your answer covers the key ideas."}
+
+
+_TRIAGE_INTENTS = ("ASKING_QUESTION", "PROVIDING_ANSWER", "ACKNOWLEDGEMENT")
+_TRIAGE_VERDICTS = ("CORRECT", "PARTIAL", "WRONG")
+
+
+def _label(value: str, labels: Tuple[str, ...], default: Optional[str]) -> Optional[str]:
+    """The shared constant for a parsed label, so results hold one object per label rather than a fresh string"""
+    # First word only, so "CORRECT." or "**Correct**" still map to their label
+    m = _WORD_RE.search(value)
+    value = m.group(0).upper() if m else ""
+    for label in labels:
+        if label == value:
+            return label
+    return default
+
+
+# Free-text grading format: VERDICT:/JUSTIFICATION:/CORRECTION: lines, tolerating **bold** labels
+_EVAL_FIELD_RE = re.compile(r'\b(VERDICT|JUSTIFICATION|CORRECTION)\**[ \t]*:\**[ \t]*([^\n]*)', re.IGNORECASE)
+
+
+def _parse_eval_fields(resp: str) -> Dict[str, str]:
+    """Map each grading label to the rest of its line, first occurrence winning, in a single pass"""
+    fields: Dict[str, str] = {}
+    for m in _EVAL_FIELD_RE.finditer(resp):
+        fields.setdefault(m.group(1).upper(), m.group(2).strip())
+    return fields
 
 
 @tool
@@ -313,24 +761,30 @@ def evaluate_answer(user_answer: str, expected_keywords: List[str], conversation
                    title: str = "", content: str = "", assistant_message: str = "", 
                    check_question: str = "") -> Dict[str, Any]:
     """Evaluate user answer using full context."""
-    prompt = revision_prompts.EVAL_WITH_CONTEXT_TEMPLATE.format(
+    keywords = expected_keywords or []
+    local = _local_verdict(user_answer, keywords) if keywords != _title_keywords(title) else None
+    if local is not None:
+        logger.debug("Graded locally: %s", local["verdict"])
+        return local
+
+    prompt = revision_prompts.EVAL_WITH_CONTEXT_FORMATTER(
         title=title, content=content, assistant_message=assistant_message,
         check_question=check_question, user_answer=user_answer
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
-    
-    verdict = "WRONG"
-    justification = ""
-    correction = ""
+    resp = _cached_generate(
+        "evaluate_answer", prompt, response_mime_type="application/json", response_schema=_EVAL_SCHEMA
+    )
     
-    for line in resp.splitlines():
-        line_low = line.strip()
-        if line_low.upper().startswith("VERDICT:"):
-            verdict = line_low.split(":",1)[1].strip().upper()
-        elif line_low.upper().startswith("JUSTIFICATION:"):
-            justification = line_low.split(":",1)[1].strip()
-        elif line_low.upper().startswith("CORRECTION:"):
-            correction = line_low.split(":",1)[1].strip()
+    data = _json_object(resp)
+    if data is not None:
+        verdict = _label(str(data.get("verdict") or ""), _TRIAGE_VERDICTS, "WRONG")
+        justification = str(data.get("justification") or "").strip()
+        correction = str(data.get("correction") or "").strip()
+    else:
+        fields = _parse_eval_fields(resp)
+        verdict = _label(fields.get("VERDICT", ""), _TRIAGE_VERDICTS, "WRONG")
+        justification = fields.get("JUSTIFICATION", "")
+        correction = fields.get("CORRECTION", "")
     
     return {
         "verdict": verdict,
@@ -343,96 +797,320 @@ def evaluate_answer(user_answer: str, expected_keywords: List[str], conversation
 def handle_qa_request(user_question: str, current_concept: str, content: str, 
                      conversation_history: str = "") -> str:
     """Handle Q&A requests during revision sessions"""
-    prompt = revision_prompts.QA_RESPONSE_TEMPLATE.format(
+    prompt = revision_prompts.QA_RESPONSE_FORMATTER(
         user_question=user_question, current_concept=current_concept,
         content=content, conversation_history=conversation_history
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
+    resp = _cached_generate("handle_qa_request", prompt)
     return resp.strip()
 
 
+_STOPWORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "do", "does", "did",
+    "i", "me", "my", "you", "your", "we", "us", "it", "its", "this", "that", "these", "those",
+    "he", "she", "they", "his", "her", "their", "them",
+    "what", "who", "whom", "which", "when", "where", "why", "how",
+    "of", "in", "on", "at", "to", "for", "from", "by", "with", "about", "as", "into", "and", "or",
+    "but", "if", "so", "not", "no", "can", "could", "would", "should", "will", "shall", "may",
+    "might", "must", "please", "tell", "explain", "give", "some", "any", "more", "again", "there",
+})
+# Share of the user's content words found in the concept text
+_RELEVANT_OVERLAP = 0.5
+
+
+def _lexical_relevance(user_input: str, current_concept: str, content: str) -> Optional[str]:
+    """Cheap token-overlap relevance check: RELEVANT on a clear overlap, otherwise None.
+
+    A low overlap proves nothing: follow-ups such as "give me an example" or
+    "I don't get it, why?" share no words with the content, so they go to the
+    classifiers or the LLM.
+    """
+    user_tokens = set(_WORD_RE.findall(user_input.lower())) - _STOPWORDS
+    if not user_tokens:
+        return None
+    concept_tokens = set(_WORD_RE.findall(f"{current_concept} {content}".lower())) - _STOPWORDS
+    if len(user_tokens & concept_tokens) / len(user_tokens) >= _RELEVANT_OVERLAP:
+        return "RELEVANT"
+    return None
+
+
+_CONCEPT_KEYWORDS = 15
+
+
+@lru_cache(maxsize=256)
+def _concept_keywords(content: str) -> str:
+    """Most frequent content words of a concept, extracted once per concept for the relevance prompt"""
+    counts: Dict[str, int] = {}
+    for word in _WORD_RE.findall(content.lower()):
+        if len(word) > 2 and not word.isdigit() and word not in _STOPWORDS:
+            counts[word] = counts.get(word, 0) + 1
+    # sorted() is stable, so ties keep their first-occurrence order
+    return ", ".join(sorted(counts, key=counts.get, reverse=True)[:_CONCEPT_KEYWORDS])
+
+
+def _local_relevance(user_input: str, current_concept: str, content: str) -> Optional[str]:
+    """Relevance from the cheapest local signal that is confident; None when the LLM must decide"""
+    relevance = _lexical_relevance(user_input, current_concept, content)
+    if relevance is not None:
+        return relevance
+    concept_text = f"{current_concept}: {content}"
+    relevance = relevance_classifier.predict(user_input, concept_text)
+    if relevance is not None:
+        return relevance
+    return embedding_relevance.classify(user_input, concept_text)
+
+
 @tool
 def check_question_relevance(user_input: str, current_concept: str, content: str) -> str:
     """Check if user's question is relevant to current concept"""
-    prompt = revision_prompts.RELEVANCE_CHECK_TEMPLATE.format(
-        user_input=user_input, current_concept=current_concept, content=content
+    relevance = _local_relevance(user_input, current_concept, content)
+    if relevance is not None:
+        return relevance
+
+    prompt = revision_prompts.RELEVANCE_CHECK_FORMATTER(
+        user_input=user_input, current_concept=current_concept,
+        concept_keywords=_concept_keywords(content)
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
+    resp = _cached_generate(
+        "check_question_relevance", prompt, response_mime_type=_ENUM_MIME_TYPE, response_schema=_RELEVANCE_SCHEMA
+    )
+    return _parse_relevance(resp)
+
+
+def _parse_relevance(resp: str) -> str:
+    """Map a relevance-check response to RELEVANT/IRRELEVANT"""
     classification = resp.strip().upper()
+    # Check IRRELEVANT first: "RELEVANT" is a substring of it
+    if "IRRELEVANT" in classification:
+        return "IRRELEVANT"
     return "RELEVANT" if "RELEVANT" in classification else "IRRELEVANT"
 
 
-@tool
-def handle_custom_input(user_input: str, current_concept: str, content: str, 
-                       conversation_history: str = "") -> str:
-    """Handle custom/irrelevant user input"""
-    relevance = check_question_relevance.invoke({
-        "user_input": user_input,
-        "current_concept": current_concept,
-        "content": content
-    })
-    
+_FUSED_CLASS_RE = re.compile(r'^[ \t]*CLASSIFICATION:[ \t]*(\w+)', re.MULTILINE | re.IGNORECASE)
+_FUSED_RESPONSE_RE = re.compile(r'^[ \t]*RESPONSE:[ \t]*', re.MULTILINE | re.IGNORECASE)
+
+
+def _parse_fused_relevance_qa(resp: str) -> Tuple[str, str]:
+    """Split a fused relevance+QA response into (RELEVANT/IRRELEVANT, response text)"""
+    m = _FUSED_CLASS_RE.search(resp)
+    relevance = _parse_relevance(m.group(1)) if m else "RELEVANT"
+    # The response may span several lines; keep everything after the marker
+    r = _FUSED_RESPONSE_RE.search(resp)
+    text = resp[r.end():] if r else (resp[m.end():] if m else resp)
+    return relevance, text.strip()
+
+
+def _custom_input_prompt(user_input: str, current_concept: str, content: str,
+                         conversation_history: str) -> Tuple[str, str]:
+    """Tool name and prompt for a custom input.
+
+    Inputs a local check can classify need only their answer or redirect;
+    anything else is classified and answered in a single fused call.
+    """
+    relevance = _local_relevance(user_input, current_concept, content)
+
     if relevance == "RELEVANT":
-        return handle_qa_request.invoke({
-            "user_question": user_input,
-            "current_concept": current_concept,
-            "content": content,
-            "conversation_history": conversation_history
-        })
-    else:
-        prompt = revision_prompts.CUSTOM_INPUT_TEMPLATE.format(
+        return "handle_qa_request", revision_prompts.QA_RESPONSE_FORMATTER(
+            user_question=user_input, current_concept=current_concept,
+            content=content, conversation_history=conversation_history
+        )
+
+    if relevance == "IRRELEVANT":
+        return "handle_custom_input", revision_prompts.CUSTOM_INPUT_FORMATTER(
             user_input=user_input, current_concept=current_concept,
             content=content, conversation_history=conversation_history
         )
-        resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
+
+    return "handle_custom_input_fused", revision_prompts.FUSED_RELEVANCE_QA_FORMATTER(
+        user_input=user_input, current_concept=current_concept,
+        content=content, conversation_history=conversation_history
+    )
+
+
+def _custom_input_reply(tool_name: str, resp: str) -> str:
+    if tool_name != "handle_custom_input_fused":
         return resp.strip()
+    relevance, text = _parse_fused_relevance_qa(resp)
+    logger.debug("Fused relevance classification: %s", relevance)
+    return text
+
+
+def _handle_custom_input(user_input: str, current_concept: str, content: str,
+                         conversation_history: str = "") -> str:
+    tool_name, prompt = _custom_input_prompt(user_input, current_concept, content, conversation_history)
+    return _custom_input_reply(tool_name, _cached_generate(tool_name, prompt))
+
+
+async def ahandle_custom_input(user_input: str, current_concept: str, content: str,
+                               conversation_history: str = "") -> str:
+    """Async counterpart of handle_custom_input"""
+    tool_name, prompt = _custom_input_prompt(user_input, current_concept, content, conversation_history)
+    return _custom_input_reply(tool_name, await _acached_generate(tool_name, prompt))
+
+
+# Sync callers (worker threads) use the blocking client; ainvoke from a running loop awaits the async one
+handle_custom_input = StructuredTool.from_function(
+    func=_handle_custom_input, coroutine=ahandle_custom_input,
+    name="handle_custom_input", description="Handle custom/irrelevant user input",
+)
+
+
+_ACKS = frozenset({"yes", "ok", "okay", "got it", "thanks", "thank you", "yep", "yeah", "sure", "k", "cool"})
+# A question word opens a question only when an auxiliary follows ("when does ..."); "when an object
+# falls ..." is a statement
+_QUESTION_RE = re.compile(
+    r"^(?:what|why|how|when|where|who|which)(?:'s|\s+(?:is|are|was|were|do|does|did|can|could|will|would"
+    r"|should|shall|may|might|must|has|have|had)\b)"
+)
+
+
+@lru_cache(maxsize=1024)
+def _fast_intent(user_input: str) -> Optional[str]:
+    """Rule-based intent for clear-cut inputs; None when the LLM has to decide.
+
+    Never PROVIDING_ANSWER: outside a check question that label routes to an
+    off-topic redirect, and short inputs like "define force" are requests.
+    """
+    text = user_input.strip().lower()
+    if text.rstrip('.!') in _ACKS:
+        return "ACKNOWLEDGEMENT"
+    if text.endswith('?') or _QUESTION_RE.match(text):
+        return "ASKING_QUESTION"
+    return None
 
 
 @tool
 def detect_question_intent(user_input: str, current_concept: str, 
                           conversation_history: str = "") -> str:
     """Detect if user input is a question or answer"""
-    prompt = revision_prompts.QUESTION_DETECTION_TEMPLATE.format(
+    intent = _fast_intent(user_input)
+    if intent is not None:
+        return intent
+    intent = intent_classifier.predict(user_input, current_concept)
+    if intent is not None:
+        return intent
+
+    prompt = revision_prompts.QUESTION_DETECTION_FORMATTER(
         user_input=user_input, current_concept=current_concept,
         conversation_history=conversation_history
     )
-    resp = llm_wrapper.generate_response([{"role":"user","content": prompt}])
+    # Intent depends on the input itself, not on the ever-growing history
+    resp = _cached_generate(
+        "detect_question_intent", prompt,
+        key_fields={"user_input": user_input, "current_concept": current_concept},
+        response_mime_type=_ENUM_MIME_TYPE, response_schema=_INTENT_SCHEMA,
+    )
     classification = resp.strip().upper()
     
     if "ASKING_QUESTION" in classification:
         return "ASKING_QUESTION"
-    elif "PROVIDING_ANSWER" in classification:
-        return "PROVIDING_ANSWER"
+    elif "ACKNOWLEDGEMENT" in classification:
+        return "ACKNOWLEDGEMENT"
     else:
         return "PROVIDING_ANSWER"
 
 
+_TRIAGE_FIELD_RE = re.compile(
+    r'^\s*"?(intent|relevance|verdict|justification|correction)"?\s*:\s*"?([^"\n]*?)"?\s*,?\s*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def _parse_triage(resp: str) -> Dict[str, Any]:
+    """Parse the fused triage response, falling back to a line-by-line scan"""
+    fields: Dict[str, Any] = {}
+    start, end = resp.find("{"), resp.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = _json_loads(resp[start:end + 1])
+            if isinstance(data, dict):
+                fields = {str(k).lower(): v for k, v in data.items()}
+        except ValueError:
+            pass
+
+    if not fields:
+        for m in _TRIAGE_FIELD_RE.finditer(resp):
+            fields[m.group(1).lower()] = m.group(2).strip()
+
+    return {
+        "intent": _label(str(fields.get("intent") or ""), _TRIAGE_INTENTS, "PROVIDING_ANSWER"),
+        "relevance": _parse_relevance(str(fields.get("relevance") or "")),
+        "verdict": _label(str(fields.get("verdict") or ""), _TRIAGE_VERDICTS, None),
+        "justification": fields.get("justification") or "",
+        "correction": fields.get("correction") or "",
+    }
+
+
+@tool
+def triage_user_input(user_input: str, current_concept: str, content: str,
+                      check_question: str = "", conversation_history: str = "") -> Dict[str, Any]:
+    """Classify intent and relevance (and grade the answer, if a check question is given) in one LLM call."""
+    intent = _fast_intent(user_input)
+    if intent is None:
+        intent = intent_classifier.predict(user_input, current_concept)
+    # Acknowledgements need neither a relevance check nor grading
+    if intent == "ACKNOWLEDGEMENT":
+        return {"intent": intent, "relevance": "RELEVANT", "verdict": None,
+                "justification": "", "correction": ""}
+    # Without a check question there is nothing to grade; when both labels are clear locally, skip the call.
+    # A local IRRELEVANT is not trusted here: it would show an off-topic redirect without asking the LLM.
+    if intent is not None and not check_question:
+        if _local_relevance(user_input, current_concept, content) == "RELEVANT":
+            return {"intent": intent, "relevance": "RELEVANT", "verdict": None,
+                    "justification": "", "correction": ""}
+
+    prompt = revision_prompts.FUSED_TRIAGE_FORMATTER(
+        user_input=user_input, current_concept=current_concept, content=content,
+        check_question=check_question, conversation_history=conversation_history
+    )
+    # Like detect_question_intent, the labels depend on the input rather than the ever-growing history;
+    # relevance also depends on the content, since subtopics of different topics can share a title
+    resp = _cached_generate(
+        "triage_user_input", prompt,
+        key_fields={"user_input": user_input, "current_concept": current_concept, "check_question": check_question,
+                    "content_digest": _content_digest(content).hex()},
+        response_mime_type="application/json", response_schema=_TRIAGE_SCHEMA,
+    )
+    triage = _parse_triage(resp)
+    if intent is not None:
+        triage["intent"] = intent
+    return triage
+
+
 # Class for backward compatibility
 class RevisionAgent:
+    # Tools are module-level constants; expose them once on the class instead of per instance
+    generate_structured_explanation = generate_structured_explanation
+    generate_structured_explanations_batch = generate_structured_explanations_batch
+    generate_explanation_steps = generate_explanation_steps
+    generate_examples = generate_examples
+    make_check_question = make_check_question
+    extract_expected_keywords = extract_expected_keywords
+    evaluate_answer = evaluate_answer
+    handle_qa_request = handle_qa_request
+    check_question_relevance = check_question_relevance
+    handle_custom_input = handle_custom_input
+    detect_question_intent = detect_question_intent
+    triage_user_input = triage_user_input
+
+    _ALL_TOOLS = (
+        generate_structured_explanation,
+        generate_structured_explanations_batch,
+        generate_explanation_steps,
+        generate_examples,
+        make_check_question,
+        extract_expected_keywords,
+        evaluate_answer,
+        handle_qa_request,
+        check_question_relevance,
+        handle_custom_input,
+        detect_question_intent,
+        triage_user_input,
+    )
+
     def __init__(self, llm=None):
-        self.llm = llm or llm_wrapper
-        self.generate_structured_explanation = generate_structured_explanation
-        self.generate_explanation_steps = generate_explanation_steps
-        self.generate_examples = generate_examples
-        self.make_check_question = make_check_question
-        self.extract_expected_keywords = extract_expected_keywords
-        self.evaluate_answer = evaluate_answer
-        self.handle_qa_request = handle_qa_request
-        self.check_question_relevance = check_question_relevance
-        self.handle_custom_input = handle_custom_input
-        self.detect_question_intent = detect_question_intent
+        self.llm = llm or get_llm()
 
     def get_all_tools(self) -> List:
         """Get all tools as a list for LangGraph integration"""
-        return [
-            generate_structured_explanation,
-            generate_explanation_steps,
-            generate_examples,
-            make_check_question,
-            extract_expected_keywords,
-            evaluate_answer,
-            handle_qa_request,
-            check_question_relevance,
-            handle_custom_input,
-            detect_question_intent
-        ]
\ No newline at end of file
+        return list(self._ALL_TOOLS)
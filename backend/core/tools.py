@@ -1,18 +1,33 @@
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
 from .revision_agent import RevisionAgent
 from .quiz_agent import QuizAgent  
 from .feedback_agent import FeedbackAgent
 from .qa_agent import QAAgent
 from .conclusion_agent import ConclusionAgent
 from .mongodb_client import MongoDBClient
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
 
-# Initialize agents
-revision_agent = RevisionAgent()
-quiz_agent = QuizAgent()
-feedback_agent = FeedbackAgent()
-qa_agent = QAAgent()
-conclusion_agent = ConclusionAgent()
+# Agents are created on first use rather than at import time
+@lru_cache(maxsize=1)
+def get_revision_agent() -> RevisionAgent:
+    return RevisionAgent()
+
+@lru_cache(maxsize=1)
+def get_quiz_agent() -> QuizAgent:
+    return QuizAgent()
+
+@lru_cache(maxsize=1)
+def get_feedback_agent() -> FeedbackAgent:
+    return FeedbackAgent()
+
+@lru_cache(maxsize=1)
+def get_qa_agent() -> QAAgent:
+    return QAAgent()
+
+@lru_cache(maxsize=1)
+def get_conclusion_agent() -> ConclusionAgent:
+    return ConclusionAgent()
 
 # MongoDB tools
 @tool
@@ -20,10 +35,37 @@ def get_topic_subtopics(topic_title: str, mongodb_client: MongoDBClient) -> List
     """Get all subtopics for a specific topic."""
     return mongodb_client.get_topic_subtopics(topic_title)
 
-# Export all tools
-def get_all_tools(mongodb_client: MongoDBClient):
-    """Get all available tools for the orchestrator."""
+def _subtopic_items(topic_title: str, mongodb_client: MongoDBClient) -> List[Tuple[str, str, str]]:
     return [
+        (s.get("subtopic_title") or f"Concept {s.get('subtopic_number')}", s.get("content", ""), "")
+        for s in mongodb_client.get_topic_subtopics(topic_title)
+    ]
+
+def _prefetch_topic_explanations(topic_title: str, mongodb_client: MongoDBClient) -> int:
+    items = _subtopic_items(topic_title, mongodb_client)
+    if items:
+        get_revision_agent().generate_structured_explanations_batch.invoke({"items": items})
+    return len(items)
+
+async def _aprefetch_topic_explanations(topic_title: str, mongodb_client: MongoDBClient) -> int:
+    items = _subtopic_items(topic_title, mongodb_client)
+    if items:
+        await get_revision_agent().generate_structured_explanations_batch.ainvoke({"items": items})
+    return len(items)
+
+prefetch_topic_explanations = StructuredTool.from_function(
+    func=_prefetch_topic_explanations, coroutine=_aprefetch_topic_explanations,
+    name="prefetch_topic_explanations",
+    description="Warm the explanation cache for every subtopic of a topic with one batched generation.",
+)
+
+# Export all tools
+# Built once per client: bind() creates a new tool object on every call
+@lru_cache(maxsize=4)
+def _tools_for(mongodb_client: MongoDBClient) -> tuple:
+    revision_agent = get_revision_agent()
+    conclusion_agent = get_conclusion_agent()
+    return (
         # Revision tools
         revision_agent.generate_structured_explanation,
         revision_agent.generate_examples,
@@ -36,4 +78,9 @@ def get_all_tools(mongodb_client: MongoDBClient):
         
         # Database tools
         get_topic_subtopics.bind(mongodb_client=mongodb_client),
-    ]
\ No newline at end of file
+        prefetch_topic_explanations.bind(mongodb_client=mongodb_client),
+    )
+
+def get_all_tools(mongodb_client: MongoDBClient):
+    """Get all available tools for the orchestrator."""
+    return list(_tools_for(mongodb_client))
\ No newline at end of file
@@ -5,7 +5,7 @@ import logging
 from contextlib import asynccontextmanager
 
 from backend.config import Config
-from backend.core.llm import GeminiLLMWrapper
+from backend.core.llm import get_llm
 from backend.core.mongodb_client import MongoDBClient
 from backend.core.orchestrator_agent import OrchestratorAgent
 from backend.api import revision
@@ -29,7 +29,7 @@ async def lifespan(app: FastAPI):
         Config.validate_config()
         
         # Initialize components
-        llm_wrapper = GeminiLLMWrapper()
+        llm_wrapper = get_llm()
         mongodb_client = MongoDBClient()
         revision_agent = OrchestratorAgent( mongodb_client)  
         
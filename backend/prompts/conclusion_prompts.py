@@ -1,8 +1,16 @@
+from .formatter import PromptFormatter
 
 CONCLUSION_TEMPLATE = """
-Summarize user progress: {correct}/{total} concepts correct.
+Summarize the student's progress from the INPUT.
 Give a short overall feedback paragraph (2-3 sentences) and 2 actionable next steps.
 Include final tips and optionally suggest a short quiz or review.
+
+---
+INPUT:
+Concepts correct: {correct}/{total}
 Conversation history (latest first):
 {conversation_history}
 """
+
+
+CONCLUSION_FORMATTER = PromptFormatter(CONCLUSION_TEMPLATE)
@@ -1,4 +1,9 @@
+from .formatter import PromptFormatter
 
 FEEDBACK_CORRECT = "Excellent! That's correct! You've mastered this concept. Moving to the next topic."
 FEEDBACK_PARTIAL = "Good effort! You're on the right track. {correction} Let's try this concept again to make sure you understand it completely."
 FEEDBACK_WRONG = "Not quite right. {correction} Let's review this concept again to help you understand it better."
+
+
+FEEDBACK_PARTIAL_FORMATTER = PromptFormatter(FEEDBACK_PARTIAL)
+FEEDBACK_WRONG_FORMATTER = PromptFormatter(FEEDBACK_WRONG)
@@ -0,0 +1,39 @@
+import string
+from typing import Tuple
+
+
+class PromptFormatter:
+    """A template parsed once at import; calling it renders with the same semantics as str.format(**kw).
+
+    Optional fields that are empty are dropped together with their label, i.e. the
+    template text from the start of the line the label is on (so an empty history
+    doesn't leave a dangling "Conversation history:" line in the prompt).
+    """
+
+    __slots__ = ("_parts",)
+
+    def __init__(self, template: str, optional: Tuple[str, ...] = ("conversation_history",)):
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if field is not None and (conversion or not field.isidentifier()):
+                raise ValueError(f"Unsupported template field: {{{field}}}")
+            label = ""
+            if field in optional:
+                cut = max(literal.rstrip().rfind("\n"), 0)
+                literal, label = literal[:cut], literal[cut:]
+            parts.append((literal, label, field, spec or ""))
+        self._parts = tuple(parts)
+
+    def __call__(self, **kw) -> str:
+        out = []
+        for literal, label, field, spec in self._parts:
+            if literal:
+                out.append(literal)
+            if field is not None:
+                value = kw[field]
+                if label:
+                    if not value or (type(value) is str and value.isspace()):
+                        continue
+                    out.append(label)
+                out.append(value if not spec and type(value) is str else format(value, spec))
+        return "".join(out)
@@ -1,9 +1,16 @@
+from .formatter import PromptFormatter
 
 QA_ANSWER_TEMPLATE = """
-You are an expert tutor. Answer the user's question concisely (1-3 sentences). If appropriate, end with a very short follow-up check question.
+You are an expert tutor. Answer the user's question in the INPUT concisely (1-3 sentences). If appropriate, end with a very short follow-up check question.
+
+---
+INPUT:
 Question: {question}
 Context / conversation history (latest first):
 {conversation_history}
 Relevant content (if any):
 {content}
 """
+
+
+QA_ANSWER_FORMATTER = PromptFormatter(QA_ANSWER_TEMPLATE)
@@ -1,18 +1,33 @@
+from .formatter import PromptFormatter
 
 QUIZ_GENERATION_TEMPLATE = """
-Generate {n} short questions (multiple-choice or short answer) that test the concept '{title}'.
+Generate the requested number of short questions (multiple-choice or short answer) that test the concept in the INPUT.
 Each question should be simple and linked to the concept content. Return as a JSON-like list (question, options if any, correct_answer).
-Include conversation history for context:
+The conversation history is included for context.
+
+---
+INPUT:
+Number of questions: {n}
+Concept: '{title}'
+Conversation history:
 {conversation_history}
 Content:
 {content}
 """
 
 QUIZ_EVAL_TEMPLATE = """
+Judge the user's answer in the INPUT against the correct answer.
+
+Return: VERDICT: <CORRECT|PARTIAL|WRONG>\\nFEEDBACK: <one short sentence>
+
+---
+INPUT:
 User answer: {user_answer}
 Correct answer: {correct}
 Conversation history:
 {conversation_history}
-
-Return: VERDICT: <CORRECT|PARTIAL|WRONG>\\nFEEDBACK: <one short sentence>
 """
+
+
+QUIZ_GENERATION_FORMATTER = PromptFormatter(QUIZ_GENERATION_TEMPLATE)
+QUIZ_EVAL_FORMATTER = PromptFormatter(QUIZ_EVAL_TEMPLATE)
@@ -1,8 +1,34 @@
+# Every template keeps its static instructions first and the per-call fields
+# last, after the "---\nINPUT:" marker, so provider prefix caches can reuse the
+# identical instruction block across calls.
+
+from .formatter import PromptFormatter
+
 STRUCTURED_EXPLANATION_TEMPLATE = """
-Create a structured explanation for: "{title}"
+Create a structured explanation for the concept given in the INPUT below, using its content.
+
+Produce three parts:
+- "concept_name": 💡 **[ONLY the concept name in 1-3 words, maximum 20 characters]**
+- "explanation": 📖 **What is [concept]?** followed by a clear, detailed explanation (100+ words,
+  3-5 paragraphs): what it is (definition), how it works (process/mechanism), why it's important,
+  key characteristics or properties.
+- "examples": 🌟 **Examples of [concept]** followed by 2-3 concrete, real-world examples, each
+  relatable, connected directly to the concept, with specific details and an emoji marker (🏠, 🌍, 🔬, etc.).
+
+Use markdown with ** for bold text, emojis for visual organization and student-friendly language.
+Do NOT include labels like "MESSAGE 1" or "BUBBLE_1" inside the texts.
 
+Return ONLY a JSON object with these three fields, with no text before or after it:
+{{"concept_name": "...", "explanation": "...", "examples": "..."}}
+
+---
+INPUT:
+Concept: "{title}"
 Content: {content}
-History: {conversation_history}
+"""
+
+STRUCTURED_EXPLANATION_STREAM_TEMPLATE = """
+Create a structured explanation for the concept given in the INPUT below, using its content.
 
 Generate EXACTLY 3 separate messages/bubbles separated by "|||":
 
@@ -16,7 +42,7 @@ MESSAGE 2: Full Explanation
 
 [Provide a clear, detailed explanation of the concept. Include:
 - What it is (definition)
-- How it works (process/mechanism)  
+- How it works (process/mechanism)
 - Why it's important
 - Key characteristics or properties
 Use 3-5 paragraphs with proper formatting and emojis for clarity]
@@ -40,55 +66,89 @@ CRITICAL REQUIREMENTS:
 ✓ Do NOT include labels like "BUBBLE_1", "MESSAGE 1", etc. in the output
 ✓ Use emojis and bold text for visual organization
 ✓ Student-friendly language throughout
-"""
 
-CHECK_QUESTION_TEMPLATE = """
-Create a simple check question to test understanding of the concept '{title}'.
+CRITICAL FORMATTING REQUIREMENTS:
+1. Separate the 3 messages with "|||" (three pipes)
+2. MESSAGE 1: ONLY concept name - MAXIMUM 20 CHARACTERS
+3. MESSAGE 2: Full detailed explanation (100+ words)
+4. MESSAGE 3: 2-3 concrete examples with details
+5. Do NOT include labels like "MESSAGE 1:", "BUBBLE_1:", etc. in the output
+6. Use proper markdown formatting with ** for bold text
+7. Include emojis as shown in the template
 
-The question should:
-- Be directly related to the key concept
-- Be answerable in 1-3 words or a short sentence
-- Test the student's understanding, not memorization
-- Be clear and unambiguous
+Example output format:
+💡 **Gravity**
 
-Conversation history (latest first):
-{conversation_history}
+|||
 
-Return only the question text:
-"""
+📖 **What is Gravity?**
 
-EVAL_PROMPT_TEMPLATE = """
-You are an objective grader evaluating a student's answer to a revision question.
+Gravity is the fundamental force...
+[Full explanation continues]
 
-Expected keywords/concepts: {keywords}
-User's answer: {user_answer}
+|||
 
-Using the conversation history (latest first):
-{conversation_history}
+🌟 **Examples of Gravity**
 
-Evaluate the user's answer and decide if it is: CORRECT, PARTIAL, or WRONG.
+🍎 **Example 1:** Falling objects...
+🌍 **Example 2:** Planetary orbits...
 
-Guidelines:
-- CORRECT: Answer demonstrates clear understanding of the concept
-- PARTIAL: Answer shows some understanding but missing key elements
-- WRONG: Answer is incorrect or shows misunderstanding
+---
+INPUT:
+Concept: "{title}"
+Content: {content}
+"""
 
-Return in this exact format:
-VERDICT: <CORRECT|PARTIAL|WRONG>
-JUSTIFICATION: <brief explanation of why this verdict>
-CORRECTION: <helpful correction or guidance for the student>
+STRUCTURED_EXPLANATION_BATCH_TEMPLATE = """
+Create a structured explanation for EACH concept given in the INPUT below. Each concept is wrapped
+in <ITEM id="..."> ... </ITEM> with its content.
+
+For every item produce three parts:
+- "concept_name": 💡 **[ONLY the concept name in 1-3 words, maximum 20 characters]**
+- "explanation": 📖 **What is [concept]?** followed by a clear, detailed explanation (100+ words,
+  3-5 paragraphs): what it is, how it works, why it's important, key characteristics.
+- "examples": 🌟 **Examples of [concept]** followed by 2-3 concrete, real-world examples, each
+  with an emoji marker (🏠, 🌍, 🔬, etc.) and specific details.
+
+Use markdown with ** for bold text, emojis for visual organization and student-friendly language.
+Do NOT include labels like "MESSAGE 1" or "BUBBLE_1" inside the texts.
+
+Return ONLY a JSON array with one object per item, with no text before or after it:
+[{{"id": "<item id>", "concept_name": "...", "explanation": "...", "examples": "..."}}]
+
+---
+INPUT:
+{items}
 """
 
-QA_RESPONSE_TEMPLATE = """
-You are a helpful tutor answering a student's question during a revision session.
+CHECK_QUESTION_WITH_KEYWORDS_TEMPLATE = """
+Create a simple check question to test understanding of the concept given in the INPUT below,
+together with the keywords needed to mark an answer to it correct.
 
-Student's question: {user_question}
+The question should:
+- Be directly related to the key concept
+- Be answerable in 1-3 words or a short sentence
+- Test the student's understanding, not memorization
+- Be clear and unambiguous
 
-Current concept being revised: {current_concept}
-Concept content: {content}
+The keywords are 2-5 lowercase words/phrases that should appear in a correct answer. Prefer the
+exact target term (e.g., "unsaturated solution").
+
+Return ONLY a JSON object, with no text before or after it:
+{{"question": "...", "keywords": ["...", "..."]}}
+
+---
+INPUT:
+Concept: '{title}'
+Concept content:
+{content}
 
 Conversation history (latest first):
 {conversation_history}
+"""
+
+QA_RESPONSE_TEMPLATE = """
+You are a helpful tutor answering a student's question during a revision session.
 
 Guidelines:
 - Provide a clear, helpful answer to the student's question
@@ -99,102 +159,104 @@ Guidelines:
  - Do NOT ask meta questions like "Does that make sense?" or "Shall we continue?"
  - Do NOT ask any additional questions here. Only answer the user's question.
 
-Provide a helpful response:
-"""
+Provide a helpful response to the student's question in the INPUT below.
 
-RELEVANCE_CHECK_TEMPLATE = """
-You are analyzing whether a student's question is relevant to the current learning concept.
+---
+INPUT:
+Student's question: {user_question}
 
-Student's input: "{user_input}"
-Current concept being studied: {current_concept}
+Current concept being revised: {current_concept}
 Concept content: {content}
 
-BE EXTREMELY STRICT. This is a focused learning session, NOT a general conversation.
-
-Classify as RELEVANT ONLY if:
-- The question directly asks about the concept itself (definitions, explanations)
-- The question asks for clarification about what was just taught
-- The question asks for examples of THIS EXACT concept
-- The question uses technical terms from the current content
-
-Classify as IRRELEVANT if:
-- The question mentions people, celebrities, actors, or public figures
-- The question mentions brands, products, movies, or entertainment
-- The question is about real-world applications NOT mentioned in the content
-- The question requires general knowledge beyond the concept
-- The question is about "who", "when", "where" (trivia) rather than "what", "how", "why" (concept understanding)
-- The question seems like curiosity or conversation rather than learning
-
-CRITICAL EXAMPLES:
-- Current: "Forces and Motion" | Question: "what is applied force?" → RELEVANT
-- Current: "Forces and Motion" | Question: "how does friction work?" → RELEVANT  
-- Current: "Forces and Motion" | Question: "who is Ajith Kumar?" → IRRELEVANT (person)
-- Current: "Forces and Motion" | Question: "who is ultimate star?" → IRRELEVANT (celebrity)
-- Current: "Forces and Motion" | Question: "what car does Ajith drive?" → IRRELEVANT (trivia)
-- Current: "Forces and Motion" | Question: "how do race cars work?" → IRRELEVANT (not in content)
-- Current: "Photosynthesis" | Question: "what is chlorophyll?" → RELEVANT
-- Current: "Photosynthesis" | Question: "who discovered photosynthesis?" → IRRELEVANT (history trivia)
-
-THE RULE: If the question can be answered WITHOUT the current concept content, it's IRRELEVANT.
+Conversation history (latest first):
+{conversation_history}
+"""
+
+RELEVANCE_CHECK_TEMPLATE = """
+Classify a student's input in a focused revision session as RELEVANT or IRRELEVANT to the current concept. Be strict.
+RELEVANT: asks about the concept itself (definition, how/why it works, clarification of what was taught, examples of this concept, terms from its content).
+IRRELEVANT: anything answerable without the concept content, such as people, celebrities, brands, entertainment, trivia ("who/when/where"), applications not in the content, or small talk.
+Examples (concept "Photosynthesis"): "what is chlorophyll?" -> RELEVANT; "who discovered photosynthesis?" -> IRRELEVANT
 
 Respond with only one word: RELEVANT or IRRELEVANT
+
+---
+INPUT:
+Student's input: "{user_input}"
+Current concept being studied: {current_concept}
+Key terms from the concept content: {concept_keywords}
 """
 
 QUESTION_DETECTION_TEMPLATE = """
-You are analyzing a student's input during a revision session to determine if they are asking a question or requesting clarification.
+Classify a student's input in a revision session as exactly one of:
+ASKING_QUESTION: a question or a request for explanation, clarification, simpler wording or help, including confusion ("I don't understand").
+PROVIDING_ANSWER: an attempt to answer the check question or a statement showing their understanding.
+ACKNOWLEDGEMENT: a short acknowledgement ("yes", "ok", "got it", "thanks"), with or without punctuation.
+Example: "why do plants need sunlight?" -> ASKING_QUESTION
 
+Respond with only one word: ASKING_QUESTION or PROVIDING_ANSWER or ACKNOWLEDGEMENT
+
+---
+INPUT:
 Student's input: "{user_input}"
 
 Current concept being revised: {current_concept}
 
 Conversation history (latest first):
 {conversation_history}
+"""
 
-Determine if the student is:
-1. ASKING_QUESTION - asking a question, requesting explanation, clarification, or help
-2. PROVIDING_ANSWER - answering the check question or providing a response to be evaluated
-3. ACKNOWLEDGEMENT - saying short acknowledgements like "yes", "ok", "okay", "got it", "thanks", "thank you", "yep", "yeah", indicating they understood the explanation and are ready to proceed
+FUSED_TRIAGE_TEMPLATE = """
+You are triaging a student's input during a revision session. Perform all tasks below in one pass.
 
-Consider these as questions/clarifications:
-- Direct questions (ending with ? or question words)
-- Requests for explanation ("explain", "clarify", "help me understand")
-- Expressions of confusion ("I don't understand", "I'm confused", "can you explain")
-- Requests for simpler explanation ("in simple terms", "more simply")
-- Any request for help or clarification
+TASK 1 - intent. Classify the input as exactly one of:
+- ASKING_QUESTION: a question, or a request for explanation, clarification or help
+- PROVIDING_ANSWER: an attempt to answer the check question or a response to be evaluated
+- ACKNOWLEDGEMENT: a short acknowledgement like "yes", "ok", "got it", "thanks"
 
-Consider these as answers:
-- Direct statements attempting to answer the check question
-- Explanations that seem to be responses to the question asked
-- Statements that appear to be demonstrating understanding
+TASK 2 - relevance. Classify the input as RELEVANT only if it is about the current concept
+itself (definitions, explanations, clarification of what was taught, examples of THIS concept,
+technical terms from the content). Questions about people, celebrities, brands, entertainment,
+trivia ("who", "when", "where") or anything answerable WITHOUT the concept content are IRRELEVANT.
 
-Also identify acknowledgements even if they include punctuation.
+TASK 3 - grading. Only if a check question is given AND the intent is PROVIDING_ANSWER,
+grade the answer as CORRECT, PARTIAL or WRONG (PARTIAL if they show understanding but miss
+the key term) with one short justification sentence and one short correction sentence.
+Otherwise leave out verdict, justification and correction.
 
-Respond with only one word: ASKING_QUESTION or PROVIDING_ANSWER or ACKNOWLEDGEMENT
+Return ONLY a JSON object, with no text before or after it:
+{{"intent": "ASKING_QUESTION|PROVIDING_ANSWER|ACKNOWLEDGEMENT", "relevance": "RELEVANT|IRRELEVANT", "verdict": "CORRECT|PARTIAL|WRONG", "justification": "...", "correction": "..."}}
+
+---
+INPUT:
+Student's input: "{user_input}"
+
+Current concept being revised: {current_concept}
+Concept content: {content}
+
+Check question (empty if none was asked): {check_question}
+
+Conversation history (latest first):
+{conversation_history}
 """
 
 KEYWORDS_EXTRACTION_TEMPLATE = """
 You are selecting the minimal set of key words/phrases needed to mark an answer correct for the given check question.
 
+Return a JSON array of 2-5 lowercase keywords/phrases that should appear in a correct answer. Prefer the exact target term (e.g., "unsaturated solution").
+
+---
+INPUT:
 Concept title: {title}
 Concept content:
 {content}
 
 Check question: {question}
-
-Return a JSON array of 2-5 lowercase keywords/phrases that should appear in a correct answer. Prefer the exact target term (e.g., "unsaturated solution"). Do not add any text before or after the JSON.
 """
 
 CUSTOM_INPUT_TEMPLATE = """
 You are a helpful tutor responding to a student's irrelevant input during a revision session.
 
-Student's input: "{user_input}"
-
-Current concept being revised: {current_concept}
-Concept content: {content}
-
-Conversation history (latest first):
-{conversation_history}
-
 The student's input is off-topic and not related to the current learning concept.
 
 Guidelines:
@@ -208,117 +270,138 @@ Guidelines:
 Response format:
 "I understand you're curious about [their topic], but right now we're focusing on learning about [current concept]. Let's stay on track with that topic - it's really important for your learning! Please ask me questions related to [current concept] instead."
 
-Provide a helpful response that redirects them back to learning:
+Provide a helpful response that redirects them back to learning.
+
+---
+INPUT:
+Student's input: "{user_input}"
+
+Current concept being revised: {current_concept}
+Concept content: {content}
+
+Conversation history (latest first):
+{conversation_history}
 """
 
-EVAL_WITH_CONTEXT_TEMPLATE = """
-You are grading a student's answer to a check question during a revision session. Use the full context below.
+FUSED_RELEVANCE_QA_TEMPLATE = """
+You are a helpful tutor handling a student's input during a revision session.
 
-Concept title: {title}
-Concept content:
-{content}
+STEP 1 - Classify the input. BE EXTREMELY STRICT, this is a focused learning session.
+RELEVANT only if it asks about the concept itself (definitions, explanations, clarification of
+what was taught, examples of THIS concept, technical terms from the content).
+IRRELEVANT if it is about people, celebrities, brands, entertainment, trivia ("who", "when",
+"where"), or anything that can be answered WITHOUT the current concept content.
 
-Assistant's previous message (may include explanation and the check question):
-{assistant_message}
+STEP 2 - Respond.
+- If RELEVANT: give a clear, concise answer connected to the current concept, in simple language.
+  Do NOT ask meta questions or any additional questions.
+- If IRRELEVANT: do NOT answer it. In 2-3 sentences, acknowledge it politely and redirect the
+  student back to the current concept, suggesting they ask questions about it instead.
 
-Check question (if extracted separately): {check_question}
+Return in this exact format:
+CLASSIFICATION: <RELEVANT|IRRELEVANT>
+RESPONSE: <your answer or redirect>
 
-Student's answer: {user_answer}
+---
+INPUT:
+Student's input: "{user_input}"
 
-Decide VERDICT: CORRECT, PARTIAL, or WRONG.
-Keep it strict but fair: give PARTIAL if they show understanding but miss the key term.
+Current concept being revised: {current_concept}
+Concept content: {content}
 
-Return in this exact format (3 lines):
-VERDICT: <CORRECT|PARTIAL|WRONG>
-JUSTIFICATION: <one short sentence>
-CORRECTION: <one short sentence with the correct idea/term>
+Conversation history (latest first):
+{conversation_history}
 """
-EXAMPLES_TEMPLATE = """
-# Identity
-
-You are an educational assistant that provides practical, concrete examples to help students understand the concept: "{title}".
 
-# Instructions
+EVAL_WITH_CONTEXT_TEMPLATE = """
+You are grading a student's answer to a check question during a revision session. Use the full context in the INPUT below.
 
-## STRICT EXAMPLE COUNT RULE
-⚠️ You MUST output **exactly {num_examples} examples**.  
-* If content length is ≤ 100 characters → give exactly 3 examples.  
-* If content length is > 100 characters → give exactly 2 examples.  
-Never provide more or fewer than the required number.  
-STOP after the final required example. Do not add extra examples.  
+Decide the verdict: CORRECT, PARTIAL, or WRONG.
+Keep it strict but fair: give PARTIAL if they show understanding but miss the key term.
 
-## Core Requirements
-* Only provide examples — no definitions or structured explanations.
-* Use clear, simple language appropriate for students.
-* Make examples relatable to daily life where possible.
-* Connect each example back to the main concept.
-* Include real-world applications when relevant.
-* Use formatting to make examples easy to scan and understand.
+Return ONLY a JSON object with these fields, with no text before or after it:
+- "verdict": CORRECT, PARTIAL or WRONG
+- "justification": one short sentence
+- "correction": one short sentence with the correct idea/term
 
-## Example Structure
-* For 2 examples → Each should be detailed and thorough.
-* For 3 examples → Each should be simple, clear, and focused.
-* Use emoji markers (🌟) before each example.
-* Use **bold** for the concept title inside explanations.
-* Include arrow (→) before explanations.
-* End with a **single key takeaway** sentence.
+---
+INPUT:
+Concept title: {title}
+Concept content:
+{content}
 
-# Context
+Assistant's previous message (may include explanation and the check question):
+{assistant_message}
 
-📝 Current concept content: {content}  
-📚 Conversation history (latest first): {conversation_history}  
-📏 Content length: {content_length} characters  
-✅ Required number of examples: {num_examples}  
+Check question (if extracted separately): {check_question}
 
-# Output Format
+Student's answer: {user_answer}
+"""
+EXAMPLES_TEMPLATE = """
+You are an educational assistant giving students practical, concrete examples of the concept in the INPUT.
+
+Rules:
+- Give exactly the required number of examples from the INPUT (3 if the content is 100 characters or less, otherwise 2), then stop.
+- Examples only: no definitions or structured explanations.
+- Simple language, relatable to daily life; connect each example back to the concept and mention real-world uses where relevant.
+- With 2 examples make each detailed; with 3 keep each short and focused.
+- Follow the output format in the INPUT and end with a single key-takeaway sentence.
+
+---
+INPUT:
+Concept: "{title}"
+Content: {content}
+Conversation history (latest first): {conversation_history}
+Content length: {content_length} characters
+Required number of examples: {num_examples}
 
+Output format:
 **Here are some practical examples to help you understand {title} better:**
 
-🌟 **Example 1:** [Scenario]  
+🌟 **Example 1:** [Scenario]
 → This shows **{title}** because [explanation]
 
-🌟 **Example 2:** [Scenario]  
+🌟 **Example 2:** [Scenario]
 → This demonstrates **{title}** because [explanation]
 
 {example_3}
 
 💡 **Key takeaway:** [One sentence that ties all examples together]
-
-# Task
-
-CRITICAL: You must provide **exactly {num_examples} examples** and then stop.
 """
 
 EXPLANATION_TEMPLATE = """
-# ENHANCED EXPLANATION TEMPLATE
-🎓 You are explaining the concept '{title}' to a student in {steps} clear, progressive steps.
+You are explaining the concept in the INPUT to a student in clear, progressive steps.
+
+Rules:
+- Use exactly the number of steps given in the INPUT, starting from the basics and building on the previous step each time.
+- Format each step as: "🔸 **Step X:** [explanation]"
+- Each step is 2-4 sentences in simple, active, engaging language; explain the why and how.
+- Bold key terms; use analogies, a few emojis and a concrete or real-world example in each step.
+
+---
+INPUT:
+Concept: '{title}'
+Number of steps: {steps}
 
-📝 Content to explain:
+Content to explain:
 {content}
 
-📚 Conversation history (latest first):
+Conversation history (latest first):
 {conversation_history}
+"""
+
 
-🎯 Guidelines:
-- 🔢 Break down the concept into {steps} logical, sequential steps
-- 🏗️ Start with the most basic understanding and build complexity gradually  
-- 💬 Use simple, clear language appropriate for students
-- ⬆️ Each step should build on the previous one logically
-- 🌟 Include concrete, relatable examples in each step
-- 📖 Make each step elaborate and comprehensive, not just brief sentences
-- 🎪 Use active voice and engaging, enthusiastic language
-- 🧩 Connect each step to real-world applications when possible
-- 💡 Add visual emojis to make explanations more engaging
-- 🔍 Provide detailed explanations with "why" and "how" context
-- 📊 Include analogies, comparisons, or metaphors where helpful
-
-📋 Format Requirements:
-- Use exactly {steps} numbered steps
-- Format each step as: "🔸 **Step X:** [Elaborate explanation with examples, context, and details]"
-- Each step should be 2-4 sentences minimum, providing thorough understanding
-- Include relevant emojis throughout each step explanation
-- Bold key terms and concepts within each step
-- End each step with a practical example or application when possible
-
-🚀 Provide the detailed step-by-step explanation now:
-"""
\ No newline at end of file
+STRUCTURED_EXPLANATION_FORMATTER = PromptFormatter(STRUCTURED_EXPLANATION_TEMPLATE)
+STRUCTURED_EXPLANATION_STREAM_FORMATTER = PromptFormatter(STRUCTURED_EXPLANATION_STREAM_TEMPLATE)
+STRUCTURED_EXPLANATION_BATCH_FORMATTER = PromptFormatter(STRUCTURED_EXPLANATION_BATCH_TEMPLATE)
+CHECK_QUESTION_WITH_KEYWORDS_FORMATTER = PromptFormatter(CHECK_QUESTION_WITH_KEYWORDS_TEMPLATE)
+QA_RESPONSE_FORMATTER = PromptFormatter(QA_RESPONSE_TEMPLATE)
+RELEVANCE_CHECK_FORMATTER = PromptFormatter(RELEVANCE_CHECK_TEMPLATE)
+QUESTION_DETECTION_FORMATTER = PromptFormatter(QUESTION_DETECTION_TEMPLATE)
+FUSED_TRIAGE_FORMATTER = PromptFormatter(FUSED_TRIAGE_TEMPLATE)
+KEYWORDS_EXTRACTION_FORMATTER = PromptFormatter(KEYWORDS_EXTRACTION_TEMPLATE)
+CUSTOM_INPUT_FORMATTER = PromptFormatter(CUSTOM_INPUT_TEMPLATE)
+FUSED_RELEVANCE_QA_FORMATTER = PromptFormatter(FUSED_RELEVANCE_QA_TEMPLATE)
+EVAL_WITH_CONTEXT_FORMATTER = PromptFormatter(EVAL_WITH_CONTEXT_TEMPLATE)
+EXAMPLES_FORMATTER = PromptFormatter(EXAMPLES_TEMPLATE)
+EXPLANATION_FORMATTER = PromptFormatter(EXPLANATION_TEMPLATE)